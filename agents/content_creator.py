@@ -1,51 +1,102 @@
 # agents/content_creator.py
 
-import os
-from typing import Dict, Any
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip, AudioFileClip
-import openai
-from pytube import YouTube
+from datetime import datetime
+from typing import Dict, Any, List, Optional
 import logging
+import uuid
 
 from core.agent_base import BaseAgent
+from core.jobs import current_job_id, job_progress
+from core.llm import LLMGateway
+from core.publishing import PublishScheduler
+from media.executor import RenderExecutor
+from media.ffmpeg import fetch_segment
+from media.highlights import select_highlight
+from media.render import PLATFORM_RENDITIONS, render_renditions_ffmpeg, render_renditions_moviepy
+from media.sources import InvalidSourceError, VideoSource, YouTubeSource
+from media.store import MediaStore
 
 class ContentCreatorAgent(BaseAgent):
-    def __init__(self):
+    def __init__(
+        self,
+        llm: LLMGateway,
+        render_executor: Optional[RenderExecutor] = None,
+        media_store: Optional[MediaStore] = None,
+        video_source: Optional[VideoSource] = None,
+        ingest_mode: str = "segment",
+        render_backend: str = "ffmpeg",
+        caption_fontfile: Optional[str] = None,
+        max_duration: int = 60,
+        default_renditions: Optional[List[str]] = None,
+        highlights: bool = True,
+        highlight_audio: bool = True,
+        highlight_scan_seconds: Optional[int] = None,
+        highlight_seek_samples: int = 48,
+        scheduler: Optional[PublishScheduler] = None
+    ):
         super().__init__("ContentCreator")
         self.logger = logging.getLogger("ContentCreatorAgent")
-        self.openai_client = openai.Client(api_key=os.getenv("OPENAI_API_KEY"))
-        
+        self.llm = llm
+        self.render_executor = render_executor or RenderExecutor()
+        self.media_store = media_store or MediaStore()
+        self.video_source = video_source or YouTubeSource()
+        self.ingest_mode = ingest_mode
+        self.render_backend = render_backend
+        self.caption_fontfile = caption_fontfile
+        self.max_duration = max_duration
+        self.default_renditions = default_renditions or ["reels", "shorts", "tiktok"]
+        self.highlights = highlights
+        self.highlight_audio = highlight_audio
+        self.highlight_scan_seconds = highlight_scan_seconds
+        self.highlight_seek_samples = highlight_seek_samples
+        self.scheduler = scheduler
+
     async def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         try:
             content_type = message.get("content_type")
             content_url = message.get("content_url")
+            renditions = self._renditions_for(message.get("platform"))
 
             if content_type == "youtube":
                 # Download and process YouTube video
-                video_data = await self._process_youtube_video(content_url)
+                async with self.stage("download"):
+                    video_data = await self._process_youtube_video(content_url)
 
                 # Generate content using GPT
-                caption = await self._generate_caption(video_data["title"])
+                async with self.stage("caption"):
+                    caption = await self._generate_caption(video_data["title"])
 
-                # Create short video
-                short_path = await self._create_short(
-                    video_data["path"],
-                    caption,
-                    video_data["title"]
-                )
+                # Create one short per platform
+                async with self.stage("render"):
+                    short_paths = await self._create_short(
+                        video_data["path"],
+                        caption,
+                        video_data["title"],
+                        renditions,
+                        start=video_data["start"]
+                    )
 
                 # Schedule content
-                schedule_result = await self._schedule_content(short_path, caption)
+                async with self.stage("schedule"):
+                    schedule_result = await self._schedule_content(
+                        short_paths,
+                        caption,
+                        message.get("schedule_time"),
+                        {"content_url": content_url, "title": video_data["title"]}
+                    )
 
                 return {
                     "status": "success",
-                    # "video_path": short_path,
-                    # "caption": caption,
-                    # "schedule": schedule_result
+                    "renditions": list(short_paths),
+                    "schedule": schedule_result
                 }
 
-            return {"error": "Unsupported content type"}
+            return {"error": "Unsupported content type", "retryable": False}
 
+        except InvalidSourceError as e:
+            # A job for a video that cannot be fetched fails without retrying
+            self.logger.error(f"Invalid content source: {str(e)}")
+            return {"error": str(e), "retryable": False}
         except Exception as e:
             self.logger.error(f"Error processing content: {str(e)}")
             return {"error": str(e)}
@@ -53,63 +104,187 @@ class ContentCreatorAgent(BaseAgent):
     async def _process_youtube_video(self, url: str) -> Dict[str, str]:
         """Download and process YouTube video."""
         try:
-            yt = YouTube(url)
-            video = yt.streams.filter(progressive=True, file_extension='mp4').first()
-            output_path = f"downloads/{yt.video_id}.mp4"
-            video.download(filename=output_path)
+            key = self.video_source.key_for(url)
+            if self.ingest_mode == "segment":
+                # Only the window that ends up in the short is fetched
+                window = "highlight" if self.highlights else "0"
+                key = f"{key}_{window}-{self.max_duration}"
+
+            async def download(target_path: str) -> Dict[str, Any]:
+                source = await self.video_source.resolve(url)
+                if self.ingest_mode == "segment":
+                    start = await self._select_highlight(source["url"], source["duration"])
+                    await fetch_segment(source["url"], target_path, start, self.max_duration)
+                    return {"title": source["title"], "duration": source["duration"], "highlight_start": start}
+                await self.video_source.download(source, target_path)
+                return {"title": source["title"], "duration": source["duration"]}
+
+            entry = await self.media_store.fetch(key, download)
+
+            # A segment already starts at its highlight; full downloads are cut at render
+            start = 0
+            if self.ingest_mode != "segment":
+                start = await self._select_highlight(entry["path"], entry["duration"])
 
             return {
-                "title": yt.title,
-                "path": output_path,
-                "duration": yt.length
+                "title": entry["title"],
+                "path": entry["path"],
+                "duration": entry["duration"],
+                "start": start
             }
         except Exception as e:
             self.logger.error(f"Error downloading video: {str(e)}")
             raise
 
+    async def _select_highlight(self, url: str, duration: Optional[float]) -> float:
+        """Start of the most engaging max_duration window of url.
+
+        Falls back to the opening when selection is disabled or fails, so a
+        bad probe never costs the short.
+        """
+        if not self.highlights:
+            return 0
+        try:
+            async with self.stage("select"):
+                highlight = await select_highlight(
+                    url,
+                    self.max_duration,
+                    duration=duration,
+                    scan_seconds=self.highlight_scan_seconds,
+                    audio=self.highlight_audio,
+                    seek_samples=self.highlight_seek_samples
+                )
+            self.logger.info(
+                f"Highlight at {highlight['start']}s (score {highlight['score']}, "
+                f"{highlight['keyframes']} samples)"
+            )
+            return highlight["start"]
+        except Exception as e:
+            self.logger.warning(f"Highlight selection failed, using the opening: {str(e)}")
+            return 0
+
     async def _generate_caption(self, title: str) -> str:
         """Generate engaging caption using GPT."""
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a social media expert creating engaging captions."},
-                    {"role": "user", "content": f"Create a short, engaging caption for a video titled: {title}"}
-                ]
-            )
-            return response.choices[0].message.content
+            return await self.llm.chat([
+                {"role": "system", "content": "You are a social media expert creating engaging captions."},
+                {"role": "user", "content": f"Create a short, engaging caption for a video titled: {title}"}
+            ])
         except Exception as e:
             self.logger.error(f"Error generating caption: {str(e)}")
             raise
 
-    async def _create_short(self, video_path: str, caption: str, title: str) -> str:
-        """Create a short video with caption overlay."""
-        try:
-            clip = VideoFileClip(video_path).subclip(0, 60)
-            text_clip = TextClip(
-                caption,
-                fontsize=24,
-                color='white',
-                bg_color='black',
-                font='Arial-Bold'
-            ).set_position('bottom').set_duration(clip.duration)
+    def _renditions_for(self, platform: Any) -> List[str]:
+        """Rendition names for the requested platforms.
+
+        platform may be a name, a comma separated list of names or a list.
+        Unknown names are skipped; with none left the default renditions
+        are rendered.
+        """
+        if isinstance(platform, str):
+            platform = platform.split(",")
+        renditions = []
+        for name in platform or []:
+            rendition = PLATFORM_RENDITIONS.get(name.strip().lower())
+            if rendition is None:
+                self.logger.warning(f"No rendition for platform {name!r}")
+            elif rendition not in renditions:
+                renditions.append(rendition)
+        return renditions or list(self.default_renditions)
 
-            final_clip = CompositeVideoClip([clip, text_clip])
-            output_path = f"generated/short_{title}.mp4"
-            final_clip.write_videofile(output_path)
+    async def _create_short(
+        self,
+        video_path: str,
+        caption: str,
+        title: str,
+        renditions: List[str],
+        start: float = 0
+    ) -> Dict[str, str]:
+        """Create captioned shorts for each rendition, returning their paths by name.
 
-            return output_path
+        Outputs are named after the job, so jobs for the same video or
+        title never write over each other or over a short still waiting to
+        be published; a retried job renders to the same paths again.
+        """
+        try:
+            # The unique part goes first, since output_path truncates long names
+            run_id = current_job_id() or uuid.uuid4().hex
+            # Rendering is CPU bound; keep it off the event loop
+            with self.media_store.pinned(video_path):
+                output_paths = {
+                    name: self.media_store.output_path(f"short_{run_id}_{name}_{title}")
+                    for name in renditions
+                }
+                if self.render_backend == "moviepy":
+                    await self.render_executor.run(
+                        render_renditions_moviepy,
+                        video_path,
+                        caption,
+                        output_paths,
+                        start,
+                        self.max_duration,
+                        self.caption_fontfile
+                    )
+                else:
+                    # All renditions come out of one decode of the source
+                    await self.render_executor.run_external(
+                        lambda: render_renditions_ffmpeg(
+                            video_path,
+                            caption,
+                            output_paths,
+                            start,
+                            self.max_duration,
+                            fontfile=self.caption_fontfile,
+                            on_progress=self._render_progress()
+                        )
+                    )
+            for output_path in output_paths.values():
+                await self.media_store.register_output(output_path)
+            return output_paths
         except Exception as e:
             self.logger.error(f"Error creating short: {str(e)}")
             raise
 
-    async def _schedule_content(self, video_path: str, caption: str) -> Dict[str, Any]:
-        """Schedule content for posting."""
-        # Implementation for scheduling content
-        # This would integrate with your preferred scheduling platform
-        return {
-            "scheduled": True,
-            "platform": "livegig.me",
-            "timestamp": "2024-01-23T10:00:00Z"
-        }
+    def _render_progress(self):
+        """Progress callback that records render progress in 10% steps."""
+        reported = {"step": 0}
+
+        async def on_progress(fraction: float):
+            step = int(fraction * 10)
+            if step > reported["step"]:
+                reported["step"] = step
+                await job_progress("render", step / 10)
+
+        return on_progress
+
+    async def _schedule_content(
+        self,
+        video_paths: Dict[str, str],
+        caption: str,
+        schedule_time: Any = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Queue each rendition for posting at schedule_time, or straight away.
+
+        Inside a job, posts are keyed on the job id and platform, so a job
+        retried after a crash does not post the same short twice.
+        """
+        if self.scheduler is None:
+            return {"scheduled": False, "posts": []}
+
+        if isinstance(schedule_time, str):
+            schedule_time = datetime.fromisoformat(schedule_time)
+        job_id = current_job_id()
+        posts = [
+            await self.scheduler.schedule(
+                platform,
+                video_path,
+                caption,
+                schedule_time,
+                metadata,
+                key=f"{job_id}:{platform}" if job_id else None
+            )
+            for platform, video_path in video_paths.items()
+        ]
+        return {"scheduled": True, "posts": posts}
 
@@ -1,54 +1,262 @@
 # agents/trip_planner.py
 
-from typing import Dict, Any
-from pymongo import MongoClient
-import openai
-import os
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import re
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 
 from core.agent_base import BaseAgent
+from core.database import TourRepository
+from core.llm import LLMGateway
+from core.llm_cache import normalize_customization
+from core.prompts import compact_json, count_tokens, fit_to_budget
+
+class PackageModification(BaseModel):
+    """Changes the model proposes to a base package."""
+    
+    model_config = ConfigDict(extra="ignore")
+    
+    activities: List[str] = Field(min_length=1)
+    duration: Optional[str] = None
+    notes: Optional[str] = None
+
+# Hand-written rather than model_json_schema(), which costs several times the tokens
+SYSTEM_PROMPT = (
+    "You customize tour packages. The user sends the package and the customer's needs as JSON. "
+    'Reply with only a JSON object: {"activities": [string, ...] full list for the customized package, '
+    '"duration": string or null if unchanged, "notes": one or two sentences on what changed}'
+)
+
+# Models sometimes wrap JSON in a markdown fence despite json mode
+_JSON_FENCE = re.compile(r"^```(?:json)?\s*(.*?)\s*```$", re.DOTALL)
 
 class TripPlannerAgent(BaseAgent):
-    def __init__(self):
+    def __init__(
+        self,
+        tour_repository: TourRepository,
+        llm: LLMGateway,
+        prompt_token_budget: int = 800,
+        max_output_tokens: int = 400,
+        batch_concurrency: int = 8
+    ):
         super().__init__("TripPlanner")
-        self.mongo_client = MongoClient(os.getenv("MONGODB_CONNECTION_STRING"))
-        self.db = self.mongo_client.fursat
-        self.openai_client = openai.Client(api_key=os.getenv("OPENAI_API_KEY"))
+        self.tour_repository = tour_repository
+        self.llm = llm
+        self.prompt_token_budget = prompt_token_budget
+        self.max_output_tokens = max_output_tokens
+        self.batch_concurrency = batch_concurrency
 
     async def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        if "items" in message:
+            return await self.process_batch(message["items"])
+        
         try:
-            # Extract tour ID and customization requirements
-            tour_id = message.get("tour_id")
-            customization_needs = message.get("customization_needs", {})
-            
-            # Fetch base package data
-            base_package = await self._fetch_package_data(tour_id)
-            
-            if not base_package:
-                return {"error": "Package not found"}
+            base_package, idempotency_key, response = await self._prepare_request(message)
+            if response:
+                return response
             
             # Generate customized package
-            customized_package = await self._customize_package(
-                base_package,
-                customization_needs
-            )
+            async with self.stage("customize"):
+                customized_package = await self._customize_package(
+                    base_package,
+                    message.get("customization_needs", {})
+                )
+            if idempotency_key:
+                customized_package["idempotency_key"] = idempotency_key
             
             # Save customized package
-            saved_package = await self._save_customized_package(customized_package)
+            async with self.stage("save"):
+                saved_package = await self._save_customized_package(customized_package)
             
-            return {
-                "status": "success",
-                "package_id": saved_package["_id"],
-                "package_url": f"https://fursat.fun/tours/{saved_package['_id']}"
-            }
+            return self._package_response(saved_package["_id"])
             
         except Exception as e:
             self.logger.error(f"Error processing trip plan: {str(e)}")
             return {"error": str(e)}
 
+    async def process_batch(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Customize several packages with one read and one write to MongoDB.
+
+        Items customize concurrently, at most batch_concurrency at a time.
+        Identical requests within the batch are customized once. Each item
+        gets its own result, so one failure does not fail the batch.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        try:
+            async with self.stage("fetch_package"):
+                tours = await self.tour_repository.get_tours([item.get("tour_id") for item in items])
+            
+            # Group items that share the work: by idempotency key when the
+            # client gave one, else by request contents within this batch only
+            pending: Dict[str, List[int]] = {}
+            keyed = set()
+            for index, item in enumerate(items):
+                base_package = tours.get(item.get("tour_id"))
+                if not base_package:
+                    results[index] = {"error": "Package not found"}
+                    continue
+                key = self._idempotency_key(item.get("idempotency_key"))
+                if key:
+                    keyed.add(key)
+                else:
+                    key = self._request_fingerprint(base_package, item.get("customization_needs", {}))
+                pending.setdefault(key, []).append(index)
+            
+            async with self.stage("idempotency_lookup"):
+                existing = await self.tour_repository.find_customized_tours(list(keyed))
+            for key, package_id in existing.items():
+                for index in pending.pop(key):
+                    results[index] = self._package_response(package_id, duplicate=True)
+            
+            semaphore = asyncio.Semaphore(self.batch_concurrency)
+            
+            async def customize(key: str, index: int) -> Dict[str, Any]:
+                async with semaphore:
+                    package = await self._customize_package(
+                        tours[items[index]["tour_id"]],
+                        items[index].get("customization_needs", {})
+                    )
+                if key in keyed:
+                    package["idempotency_key"] = key
+                return package
+            
+            async with self.stage("customize"):
+                outcomes = await asyncio.gather(
+                    *(customize(key, indexes[0]) for key, indexes in pending.items()),
+                    return_exceptions=True
+                )
+            
+            packages, package_indexes = [], []
+            for (key, indexes), outcome in zip(pending.items(), outcomes):
+                if isinstance(outcome, Exception):
+                    for index in indexes:
+                        results[index] = {"error": str(outcome)}
+                else:
+                    packages.append(outcome)
+                    package_indexes.append(indexes)
+            
+            async with self.stage("save"):
+                package_ids = await self.tour_repository.insert_customized_tours(packages)
+            for indexes, package_id in zip(package_indexes, package_ids):
+                for position, index in enumerate(indexes):
+                    if isinstance(package_id, Exception):
+                        results[index] = {"error": str(package_id)}
+                    else:
+                        results[index] = self._package_response(package_id, duplicate=position > 0)
+            
+        except Exception as e:
+            self.logger.error(f"Error processing trip plan batch: {str(e)}")
+            results = [result or {"error": str(e)} for result in results]
+        
+        failed = sum(1 for result in results if "error" in result)
+        return {
+            "status": "success" if not failed else "partial" if failed < len(results) else "failed",
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "results": [{"index": index, **result} for index, result in enumerate(results)]
+        }
+
+    async def stream_message(self, message: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the itinerary tokens as they are generated, then the saved package."""
+        try:
+            base_package, idempotency_key, response = await self._prepare_request(message)
+            if response:
+                yield {"event": "error" if "error" in response else "done", "data": response}
+                return
+            
+            messages, context = self._customization_request(
+                base_package,
+                message.get("customization_needs", {})
+            )
+            chunks = []
+            async with self.stage("customize"):
+                async for chunk in self.llm.stream_chat(
+                    messages,
+                    context=context,
+                    validate=self._parse_gpt_response,
+                    **self._completion_params()
+                ):
+                    chunks.append(chunk)
+                    yield {"event": "token", "data": chunk}
+                customized_package = self._apply_modifications(base_package, "".join(chunks))
+            if idempotency_key:
+                customized_package["idempotency_key"] = idempotency_key
+            
+            async with self.stage("save"):
+                saved_package = await self._save_customized_package(customized_package)
+            
+            yield {"event": "done", "data": self._package_response(saved_package["_id"])}
+            
+        except Exception as e:
+            self.logger.error(f"Error streaming trip plan: {str(e)}")
+            yield {"event": "error", "data": {"error": str(e)}}
+
+    async def _prepare_request(
+        self,
+        message: Dict[str, Any]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[Dict[str, Any]]]:
+        """Load the base package and idempotency key (None if the client gave none) for a request.
+
+        The third element is a ready response when no customization is needed:
+        the package does not exist or the request already completed.
+        """
+        tour_id = message.get("tour_id")
+        
+        # Fetch base package data
+        async with self.stage("fetch_package"):
+            base_package = await self._fetch_package_data(tour_id)
+        
+        if not base_package:
+            return None, None, {"error": "Package not found"}
+        
+        # Return the earlier result for a request that already completed
+        idempotency_key = self._idempotency_key(message.get("idempotency_key"))
+        if idempotency_key:
+            async with self.stage("idempotency_lookup"):
+                existing = await self.tour_repository.find_customized_tour(idempotency_key)
+            if existing:
+                return base_package, idempotency_key, self._package_response(existing["_id"], duplicate=True)
+        
+        return base_package, idempotency_key, None
+
+    def _package_response(self, package_id: Any, duplicate: bool = False) -> Dict[str, Any]:
+        response = {
+            "status": "success",
+            "package_id": str(package_id),
+            "package_url": f"https://fursat.fun/tours/{package_id}"
+        }
+        if duplicate:
+            response["duplicate"] = True
+        return response
+
+    def _idempotency_key(self, client_key: Optional[str]) -> Optional[str]:
+        """Key a customization is saved and looked up under, if any.
+
+        Only a client-supplied key dedupes across requests; without one,
+        every request gets its own package, even if another client asked
+        for the same customization before.
+        """
+        return f"client:{client_key}" if client_key else None
+
+    def _request_fingerprint(self, base_package: Dict[str, Any], customization_needs: Dict[str, Any]) -> str:
+        """Hash of the normalized needs and the base package contents."""
+        payload = json.dumps(
+            {
+                "package": base_package,
+                "customization_needs": normalize_customization(customization_needs)
+            },
+            sort_keys=True,
+            default=str
+        )
+        return f"request:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
     async def _fetch_package_data(self, tour_id: str) -> Dict[str, Any]:
         """Fetch package data from MongoDB."""
         try:
-            return self.db.tours.find_one({"_id": tour_id})
+            return await self.tour_repository.get_tour(tour_id)
         except Exception as e:
             self.logger.error(f"Error fetching package: {str(e)}")
             raise
@@ -60,60 +268,109 @@ class TripPlannerAgent(BaseAgent):
     ) -> Dict[str, Any]:
         """Customize package based on user needs using GPT."""
         try:
-            # Prepare prompt for GPT
-            prompt = self._prepare_customization_prompt(
-                base_package,
-                customization_needs
-            )
+            messages, context = self._customization_request(base_package, customization_needs)
             
             # Get customization suggestions from GPT
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a travel expert customizing tour packages."},
-                    {"role": "user", "content": prompt}
-                ]
+            # Only replies that parse are cached
+            content = await self.llm.chat(
+                messages,
+                context=context,
+                validate=self._parse_gpt_response,
+                **self._completion_params()
             )
             
-            # Parse GPT response and modify package
-            modifications = self._parse_gpt_response(response.choices[0].message.content)
-            
-            # Create new customized package
-            customized_package = base_package.copy()
-            customized_package.update(modifications)
-            customized_package["is_customized"] = True
-            customized_package["original_package_id"] = base_package["_id"]
-            
-            return customized_package
+            return self._apply_modifications(base_package, content)
             
         except Exception as e:
             self.logger.error(f"Error customizing package: {str(e)}")
             raise
 
-    def _prepare_customization_prompt(
+    def _customization_request(
         self,
         base_package: Dict[str, Any],
         customization_needs: Dict[str, Any]
-    ) -> str:
-        """Prepare prompt for GPT to customize package."""
-        return f"""
-        Base Package Details:
-        - Destination: {base_package['destination']}
-        - Duration: {base_package['duration']}
-        - Activities: {', '.join(base_package['activities'])}
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """Chat messages and cache context for a customization."""
+        # Normalize needs so equivalent requests share a prompt and a cache entry
+        customization_needs = normalize_customization(customization_needs)
+
+        # Prepare prompt for GPT
+        prompt = self._prepare_customization_prompt(
+            base_package,
+            customization_needs
+        )
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        context = {
+            "tour_id": base_package["_id"],
+            "customization_needs": customization_needs
+        }
+        return messages, context
+
+    def _completion_params(self) -> Dict[str, Any]:
+        """JSON-mode output capped to what a package modification needs."""
+        return {
+            "response_format": {"type": "json_object"},
+            "max_tokens": self.max_output_tokens,
+            "temperature": 0.2
+        }
+
+    def _apply_modifications(self, base_package: Dict[str, Any], content: str) -> Dict[str, Any]:
+        """Build the customized package from the model's response."""
+        # Parse GPT response and modify package
+        modification = self._parse_gpt_response(content)
         
-        Customer Customization Needs:
-        {customization_needs}
+        # Create new customized package
+        customized_package = base_package.copy()
+        customized_package.pop("_id", None)
+        customized_package["activities"] = modification.activities
+        if modification.duration:
+            customized_package["duration"] = modification.duration
+        if modification.notes:
+            customized_package["customization_notes"] = modification.notes
+        customized_package["is_customized"] = True
+        customized_package["original_package_id"] = base_package["_id"]
         
-        Please suggest modifications to this package considering the customer's needs.
-        Return the response in a structured format that can be parsed into a package modification.
-        """
+        return customized_package
+
+    def _parse_gpt_response(self, content: str) -> PackageModification:
+        """Validate the model's JSON output into a PackageModification."""
+        content = content.strip()
+        fenced = _JSON_FENCE.match(content)
+        if fenced:
+            content = fenced.group(1)
+        try:
+            return PackageModification.model_validate_json(content)
+        except ValidationError as e:
+            self.logger.error(f"Invalid customization response: {content[:200]!r}")
+            raise ValueError(f"Model returned an invalid package modification: {e.errors()[0]['msg']}")
+
+    def _prepare_customization_prompt(
+        self,
+        base_package: Dict[str, Any],
+        customization_needs: Dict[str, Any]
+    ) -> str:
+        """Prepare a compact prompt for GPT, trimmed to the token budget."""
+        payload = fit_to_budget(
+            {
+                "destination": base_package["destination"],
+                "duration": base_package["duration"],
+                "activities": list(base_package["activities"]),
+                "needs": customization_needs
+            },
+            self.prompt_token_budget,
+            lambda text: count_tokens(text, self.llm.default_model),
+            list_fields=["activities"]
+        )
+        return compact_json(payload)
 
     async def _save_customized_package(self, package: Dict[str, Any]) -> Dict[str, Any]:
         """Save customized package to MongoDB."""
         try:
-            result = await self.db.customized_tours.insert_one(package)
-            package["_id"] = result.inserted_id
+            inserted_id = await self.tour_repository.insert_customized_tour(package)
+            package["_id"] = str(inserted_id)
             return package
         except Exception as e:
             self.logger.error(f"Error saving customized package: {str(e)}")
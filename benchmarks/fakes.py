@@ -0,0 +1,263 @@
+# benchmarks/fakes.py
+"""Local stand-ins for the external services, used by the load test.
+
+None of these talk to the network beyond localhost, so benchmarks are
+repeatable offline and do not spend API quota.
+"""
+
+import copy
+import json
+import subprocess
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+STUB_MODIFICATIONS = {
+    "activities": ["Sunrise trek", "Local food walk", "Monastery visit"],
+    "notes": "Adjusted for the customer's preferences."
+}
+
+class StubOpenAIServer:
+    """OpenAI-compatible /v1/chat/completions served from a local thread.
+
+    Every completion returns the same itinerary modification after latency
+    seconds; streamed completions spread that latency over their chunks.
+    """
+
+    def __init__(self, latency: float = 0.5, port: int = 0, chunks: int = 20):
+        self.latency = latency
+        self.chunks = chunks
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubOpenAIServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self):
+        with self._lock:
+            self.requests += 1
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                stub._count()
+                content = json.dumps(STUB_MODIFICATIONS)
+                if body.get("stream"):
+                    usage = (body.get("stream_options") or {}).get("include_usage")
+                    self._stream(body.get("model", "stub"), body.get("messages", []), content, usage)
+                else:
+                    time.sleep(stub.latency)
+                    self._complete(body.get("model", "stub"), body.get("messages", []), content)
+
+            def _complete(self, model: str, messages: List[Dict[str, Any]], content: str):
+                payload = json.dumps({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": self._usage(messages, content)
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _usage(self, messages: List[Dict[str, Any]], content: str) -> Dict[str, int]:
+                prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+                completion_tokens = len(content) // 4
+                return {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+
+            def _stream(self, model: str, messages: List[Dict[str, Any]], content: str, usage: bool):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                size = max(1, len(content) // stub.chunks)
+                pieces = [content[i:i + size] for i in range(0, len(content), size)]
+                for piece in pieces:
+                    time.sleep(stub.latency / len(pieces))
+                    self._write_chunk({
+                        "id": "chatcmpl-stream",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                    })
+                if usage:
+                    self._write_chunk({
+                        "id": "chatcmpl-stream",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [],
+                        "usage": self._usage(messages, content)
+                    })
+                self._write_raw(b"data: [DONE]\n\n")
+                self._write_raw(b"")
+
+            def _write_chunk(self, event: Dict[str, Any]):
+                self._write_raw(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+
+            def _write_raw(self, data: bytes):
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+class InMemoryTourRepository:
+    """Stand-in for TourRepository holding tours in a dict."""
+
+    def __init__(self, tours: Optional[List[Dict[str, Any]]] = None):
+        self.tours = {tour["_id"]: tour for tour in tours or []}
+        self.customized_tours: Dict[str, Dict[str, Any]] = {}
+        self._by_key: Dict[str, str] = {}
+
+    async def ensure_indexes(self):
+        pass
+
+    async def get_tour(self, tour_id: str) -> Optional[Dict[str, Any]]:
+        tour = self.tours.get(tour_id)
+        return copy.deepcopy(tour) if tour else None
+
+    async def get_tours(self, tour_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {tour_id: copy.deepcopy(self.tours[tour_id]) for tour_id in tour_ids if tour_id in self.tours}
+
+    async def update_tour(self, tour_id: str, changes: Dict[str, Any]):
+        self.tours[tour_id].update(changes)
+
+    async def invalidate_tour(self, tour_id: str):
+        pass
+
+    async def find_customized_tour(self, idempotency_key: str) -> Optional[Dict[str, Any]]:
+        package_id = self._by_key.get(idempotency_key)
+        return copy.deepcopy(self.customized_tours[package_id]) if package_id else None
+
+    async def find_customized_tours(self, idempotency_keys: List[str]) -> Dict[str, str]:
+        return {key: self._by_key[key] for key in idempotency_keys if key in self._by_key}
+
+    async def insert_customized_tours(self, packages: List[Dict[str, Any]]) -> List[str]:
+        return [await self.insert_customized_tour(package) for package in packages]
+
+    async def insert_customized_tour(self, package: Dict[str, Any]) -> str:
+        key = package.get("idempotency_key")
+        if key and key in self._by_key:
+            return self._by_key[key]
+        package_id = uuid.uuid4().hex
+        self.customized_tours[package_id] = {**package, "_id": package_id}
+        if key:
+            self._by_key[key] = package_id
+        return package_id
+
+def make_tours(count: int) -> List[Dict[str, Any]]:
+    destinations = ["Spiti Valley", "Ladakh", "Kasol", "Rishikesh", "Coorg", "Hampi", "Gokarna", "Meghalaya"]
+    return [
+        {
+            "_id": f"tour-{index}",
+            "destination": destinations[index % len(destinations)],
+            "duration": f"{3 + index % 5} days",
+            "activities": ["Trekking", "Camping", "Local cuisine", "Sightseeing"]
+        }
+        for index in range(count)
+    ]
+
+class FakeBot:
+    """Records Telegram Bot calls instead of sending them."""
+
+    def __init__(self):
+        self.messages: List[Dict[str, Any]] = []
+        self.chat_actions = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.messages.append({"chat_id": chat_id, "text": text})
+
+    async def send_chat_action(self, chat_id: int, action: str, **kwargs):
+        self.chat_actions += 1
+
+def make_test_video(path: str, seconds: int = 10, size: str = "640x360"):
+    """Write a synthetic clip with ffmpeg's test sources."""
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest",
+            path
+        ],
+        check=True
+    )
+
+def telegram_update(update_id: int, chat_id: int, text: str) -> Dict[str, Any]:
+    """A Telegram webhook update carrying a text message."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Load"},
+            "text": text
+        }
+    }
+
+def whatsapp_batch(message_ids: List[str], sender: str, text: str, statuses: int = 1) -> Dict[str, Any]:
+    """A Meta Cloud API webhook body with several messages and delivery receipts."""
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "benchmark",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "messages": [
+                        {
+                            "id": message_id,
+                            "from": sender,
+                            "timestamp": str(int(time.time())),
+                            "type": "text",
+                            "text": {"body": text}
+                        }
+                        for message_id in message_ids
+                    ],
+                    "statuses": [
+                        {"id": f"wamid.status-{uuid.uuid4().hex}", "status": "delivered"}
+                        for _ in range(statuses)
+                    ]
+                }
+            }]
+        }]
+    }
@@ -0,0 +1,114 @@
+# benchmarks/highlights.py
+"""Time highlight selection against source length and against a render.
+
+Usage (from the repository root):
+
+    python -m benchmarks.highlights --lengths 120,600,1800 --clip 60
+
+For each length a synthetic source is generated: a flat grey frame with a
+quiet tone, except for one clip-long window of moving test pattern and loud
+audio placed two thirds of the way in. Selection is timed on each source and
+its pick is compared with where that window really starts. One render of a
+shorts clip from the shortest source gives the reference the selection cost is
+reported against.
+
+With --seek the sources are sampled at seek points, as remote URLs are,
+instead of scanned keyframe by keyframe.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from typing import Any, Dict
+
+from benchmarks.render_backends import CAPTION
+from media.highlights import select_highlight
+from media.render import render_renditions_ffmpeg
+
+def make_source(path: str, seconds: int, highlight_start: int, clip: int, size: str = "1280x720"):
+    window = f"between(t,{highlight_start},{highlight_start + clip})"
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"color=c=0x404040:size={size}:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            "-filter_complex",
+            f"[0:v][1:v]overlay=enable='{window}'[v];"
+            f"[2:a]volume='if({window},1,0.05)':eval=frame[a]",
+            "-map", "[v]", "-map", "[a]",
+            "-c:v", "libx264", "-preset", "ultrafast", "-g", "60", "-c:a", "aac",
+            path
+        ],
+        check=True
+    )
+
+def cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+async def timed(coro) -> Dict[str, Any]:
+    started, cpu = time.perf_counter(), cpu_seconds()
+    result = await coro
+    return {
+        "result": result,
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "cpu_seconds": round(cpu_seconds() - cpu, 3)
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="highlight-bench-")
+    lengths = sorted(int(length) for length in args.lengths.split(","))
+    results: Dict[str, Any] = {"clip_seconds": args.clip, "sources": {}}
+
+    for length in lengths:
+        source = os.path.join(workdir, f"source_{length}.mp4")
+        expected = (length * 2 // 3) if length > args.clip * 2 else 0
+        make_source(source, length, expected, args.clip)
+
+        selection = await timed(select_highlight(source, args.clip, audio=not args.no_audio, seek=args.seek))
+        results["sources"][str(length)] = {
+            "expected_start": expected,
+            "selected_start": selection["result"]["start"],
+            "error_seconds": round(abs(selection["result"]["start"] - expected), 3),
+            "keyframes": selection["result"]["keyframes"],
+            "wall_seconds": selection["wall_seconds"],
+            "cpu_seconds": selection["cpu_seconds"]
+        }
+        print(f"{length}s: {json.dumps(results['sources'][str(length)])}")
+
+        if "render" not in results:
+            output = os.path.join(workdir, "short.mp4")
+            render = await timed(render_renditions_ffmpeg(source, CAPTION, {"shorts": output}, 0, args.clip))
+            results["render"] = {"wall_seconds": render["wall_seconds"], "cpu_seconds": render["cpu_seconds"]}
+            print(f"render {args.clip}s clip: {json.dumps(results['render'])}")
+
+    for item in results["sources"].values():
+        item["fraction_of_render_cpu"] = round(item["cpu_seconds"] / results["render"]["cpu_seconds"], 3)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lengths", default="120,600,1800", help="Source lengths in seconds")
+    parser.add_argument("--clip", type=int, default=60)
+    parser.add_argument("--no-audio", action="store_true", help="Score video only")
+    parser.add_argument("--seek", action="store_true", help="Sample seek points, as for remote sources")
+    parser.add_argument("--results", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for length, item in results["sources"].items():
+        print(f"{length:>6}s source: {item['cpu_seconds']}s CPU, {item['fraction_of_render_cpu']:.1%} of a render")
+
+    if args.results:
+        with open(args.results, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
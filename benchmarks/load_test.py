@@ -0,0 +1,276 @@
+# benchmarks/load_test.py
+"""Offline load test of the API and webhooks against local stand-ins.
+
+Usage (from the repository root):
+
+    python -m benchmarks.load_test --requests 500 --concurrency 50 --results load.json
+    python -m benchmarks.load_test --baseline load.json --tolerance 0.2
+
+OpenAI is replaced by a stub HTTP server with --llm-latency seconds of delay,
+tours live in memory, the job queue and LLM cache use their in-memory
+backends, videos are synthetic clips from ffmpeg and Telegram calls are
+recorded instead of sent. Requests go through the ASGI app in process, so
+the numbers cover the application but not uvicorn's socket handling.
+
+Each scenario reports p50/p95/p99 latency, requests per second, error counts
+and the process's peak RSS so far. With --baseline, p95 latency or
+throughput worse than the tolerance fails the run.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.fakes import (
+    FakeBot,
+    InMemoryTourRepository,
+    StubOpenAIServer,
+    make_test_video,
+    make_tours,
+    telegram_update,
+    whatsapp_batch
+)
+
+SCENARIOS = ("trip", "trip_batch", "content", "telegram", "whatsapp")
+
+# (method, path, json body)
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+def configure_env(args: argparse.Namespace, openai_url: str, workdir: str):
+    """Point the application at the stand-ins; must run before main is imported."""
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": openai_url,
+        "MONGODB_CONNECTION_STRING": "mongodb://localhost:27017",
+        "TELEGRAM_BOT_TOKEN": "123456:benchmark",
+        "YOUTUBE_API_KEY": "benchmark",
+        "JOB_BACKEND": "memory",
+        "LLM_CACHE_BACKEND": "memory",
+        "VIDEO_SOURCE": "local",
+        "LOCAL_MEDIA_DIR": os.path.join(workdir, "sources"),
+        "DOWNLOAD_DIR": os.path.join(workdir, "downloads"),
+        "GENERATED_DIR": os.path.join(workdir, "generated"),
+        "RATE_LIMIT_CALLS": str(10 ** 9),
+        "WEBHOOK_MAX_PENDING": str(max(256, args.requests * args.batch_size))
+    })
+    os.environ.pop("REDIS_URL", None)
+    os.makedirs("logs", exist_ok=True)
+
+def request_builders(args: argparse.Namespace, videos: List[str]) -> Dict[str, Callable[[int], RequestSpec]]:
+    def needs(index: int) -> str:
+        return f"variant {index % args.distinct}"
+
+    def trip(index: int) -> RequestSpec:
+        return "POST", "/api/v1/trip/customize", {
+            "tour_id": f"tour-{index % args.tours}",
+            "customization_needs": {"interests": needs(index)}
+        }
+
+    def trip_batch(index: int) -> RequestSpec:
+        return "POST", "/api/v1/trip/customize/batch", {
+            "items": [trip(index * args.batch_size + item)[2] for item in range(args.batch_size)]
+        }
+
+    def content(index: int) -> RequestSpec:
+        return "POST", "/api/v1/content/create", {
+            "content_url": videos[index % len(videos)],
+            "platform": "instagram"
+        }
+
+    def telegram(index: int) -> RequestSpec:
+        text = f"/customizetrip tour-{index % args.tours} {needs(index)}"
+        return "POST", "/webhook/telegram", telegram_update(10 ** 6 + index, 5000 + index % args.chats, text)
+
+    def whatsapp(index: int) -> RequestSpec:
+        message_ids = [f"wamid.bench-{index}-{item}" for item in range(args.batch_size)]
+        text = f"/customizetrip tour-{index % args.tours} {needs(index)}"
+        return "POST", "/webhook/whatsapp", whatsapp_batch(message_ids, f"91{9000000000 + index % args.chats}", text)
+
+    return {
+        "trip": trip,
+        "trip_batch": trip_batch,
+        "content": content,
+        "telegram": telegram,
+        "whatsapp": whatsapp
+    }
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+async def drive(client: Any, build: Callable[[int], RequestSpec], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Send requests through client with at most concurrency in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    error_bodies = 0
+
+    async def one(index: int):
+        nonlocal error_bodies
+        method, path, body = build(index)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        try:
+            if "error" in response.json():
+                error_bodies += 1
+        except ValueError:
+            pass
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    wall = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "rps": round(requests / wall, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2)
+        },
+        "status_codes": statuses,
+        "error_responses": error_bodies,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+async def wait_for_jobs(services: Any, timeout: float) -> float:
+    """Seconds until the content job queue is empty, or timeout."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if await services.job_queue.count_active() == 0:
+            break
+        await asyncio.sleep(0.2)
+    return round(time.perf_counter() - started, 3)
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    stub = StubOpenAIServer(latency=args.llm_latency).start()
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    configure_env(args, stub.base_url, workdir)
+
+    scenarios = args.scenarios.split(",")
+    videos = []
+    if "content" in scenarios:
+        os.makedirs(os.path.join(workdir, "sources"))
+        for index in range(args.videos):
+            name = f"clip{index}.mp4"
+            make_test_video(os.path.join(workdir, "sources", name), seconds=args.video_seconds)
+            videos.append(name)
+
+    import main
+
+    services = main.services.build()
+    repository = InMemoryTourRepository(make_tours(args.tours))
+    services.tour_repository = repository
+    services.trip_planner.tour_repository = repository
+    services.bot = FakeBot()
+    await services.start()
+
+    results: Dict[str, Any] = {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "distinct": args.distinct,
+            "batch_size": args.batch_size
+        },
+        "scenarios": {}
+    }
+    builders = request_builders(args, videos)
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+            for scenario in scenarios:
+                result = await drive(client, builders[scenario], args.requests, args.concurrency)
+                # Webhooks and content jobs finish after the response; time that too
+                if scenario == "telegram":
+                    started = time.perf_counter()
+                    await services.telegram_webhooks.drain(timeout=args.drain_timeout)
+                    result["drain_seconds"] = round(time.perf_counter() - started, 3)
+                elif scenario == "whatsapp":
+                    started = time.perf_counter()
+                    await services.whatsapp_webhooks.drain(timeout=args.drain_timeout)
+                    result["drain_seconds"] = round(time.perf_counter() - started, 3)
+                elif scenario == "content" and args.wait_jobs:
+                    result["drain_seconds"] = await wait_for_jobs(services, args.drain_timeout)
+                results["scenarios"][scenario] = result
+                print(f"{scenario}: {json.dumps(result)}")
+    finally:
+        results["openai_stub_requests"] = stub.requests
+        results["openai"] = services.llm.get_stats()
+        await services.stop()
+        stub.stop()
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Scenarios whose p95 latency or throughput regressed beyond tolerance."""
+    regressions = []
+    for scenario, result in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if not before:
+            continue
+        if result["latency_ms"]["p95"] > before["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append(
+                f"{scenario}: p95 {before['latency_ms']['p95']}ms -> {result['latency_ms']['p95']}ms"
+            )
+        if result["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{scenario}: rps {before['rps']} -> {result['rps']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub OpenAI delay in seconds")
+    parser.add_argument("--tours", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=10 ** 9, help="Distinct customization requests (lower it to exercise caching)")
+    parser.add_argument("--chats", type=int, default=1000, help="Distinct Telegram chats / WhatsApp senders")
+    parser.add_argument("--batch-size", type=int, default=5, help="Items per batch customization / WhatsApp webhook")
+    parser.add_argument("--videos", type=int, default=2)
+    parser.add_argument("--video-seconds", type=int, default=10)
+    parser.add_argument("--wait-jobs", action="store_true", help="Also time content jobs to completion")
+    parser.add_argument("--drain-timeout", type=float, default=300)
+    parser.add_argument("--results", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.results:
+        with open(args.results, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# benchmarks/render_backends.py
+"""Compare wall time, CPU time and peak RSS of the render backends.
+
+Usage (from the repository root):
+
+    python -m benchmarks.render_backends --source-seconds 120 --duration 60
+    python -m benchmarks.render_backends --backends renditions,renditions-separate
+
+A synthetic source is generated with ffmpeg's test sources unless --source
+is given. Each backend renders every rendition in a fresh interpreter so
+peak RSS is not shared between runs. Geometry and duration of each
+rendition are compared across backends as a parity check.
+
+renditions writes every platform rendition from one ffmpeg pass;
+renditions-separate renders the same outputs one ffmpeg run each, which is
+what publishing per platform cost before; moviepy renders them through
+moviepy.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+CAPTION = "Sunrise over the Himalayas - a week in Spiti Valley"
+
+def make_source(path: str, seconds: int, size: str = "1280x720"):
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest",
+            path
+        ],
+        check=True
+    )
+
+def probe(path: str) -> Dict[str, Any]:
+    output = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height:format=duration",
+            "-of", "json", path
+        ],
+        check=True, capture_output=True, text=True
+    ).stdout
+    data = json.loads(output)
+    stream = data["streams"][0]
+    return {
+        "width": stream["width"],
+        "height": stream["height"],
+        "duration": round(float(data["format"]["duration"]), 2)
+    }
+
+def rendition_outputs(output: str) -> Dict[str, str]:
+    from media.render import RENDITIONS
+
+    base, extension = os.path.splitext(output)
+    return {name: f"{base}_{name}{extension}" for name in RENDITIONS}
+
+def run_child(backend: str, source: str, output: str, duration: float):
+    """Render once in this process and print timing as JSON."""
+    from media.render import render_renditions_ffmpeg, render_renditions_moviepy
+
+    started = time.perf_counter()
+    if backend == "moviepy":
+        render_renditions_moviepy(source, CAPTION, rendition_outputs(output), 0, duration)
+    elif backend == "renditions-separate":
+        for name, path in rendition_outputs(output).items():
+            asyncio.run(render_renditions_ffmpeg(source, CAPTION, {name: path}, 0, duration))
+    else:
+        asyncio.run(render_renditions_ffmpeg(source, CAPTION, rendition_outputs(output), 0, duration))
+    wall = time.perf_counter() - started
+
+    # ru_maxrss is in KiB on Linux; children covers the ffmpeg processes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    print(json.dumps({
+        "wall_seconds": round(wall, 3),
+        "subprocess_cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+        "python_peak_rss_mb": round(own / 1024, 1),
+        "subprocess_peak_rss_mb": round(children / 1024, 1),
+        "peak_rss_mb": round(max(own, children) / 1024, 1)
+    }))
+
+def run_backend(backend: str, source: str, output: str, duration: float) -> Dict[str, Any]:
+    completed = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.render_backends",
+            "--child", backend, "--source", source,
+            "--output-video", output, "--duration", str(duration)
+        ],
+        check=True, capture_output=True, text=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["outputs"] = {name: probe(path) for name, path in rendition_outputs(output).items()}
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", help="Existing video to render from")
+    parser.add_argument("--source-seconds", type=int, default=120)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--backends", default="renditions,moviepy")
+    parser.add_argument("--results", help="Write results as JSON to this path")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--output-video", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.source, args.output_video, args.duration)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="render-bench-")
+    source = args.source or os.path.join(workdir, "source.mp4")
+    if not args.source:
+        make_source(source, args.source_seconds)
+
+    results = {"source": probe(source), "clip_seconds": args.duration, "backends": {}}
+    for backend in args.backends.split(","):
+        output = os.path.join(workdir, f"short_{backend}.mp4")
+        results["backends"][backend] = run_backend(backend, source, output, args.duration)
+        print(f"{backend}: {json.dumps(results['backends'][backend])}")
+
+    outputs = [result["outputs"] for result in results["backends"].values()]
+    results["parity"] = all(
+        item[name]["width"] == outputs[0][name]["width"]
+        and item[name]["height"] == outputs[0][name]["height"]
+        and abs(item[name]["duration"] - outputs[0][name]["duration"]) < 0.5
+        for item in outputs
+        for name in outputs[0]
+    )
+    print(f"output parity: {results['parity']}")
+
+    if args.results:
+        with open(args.results, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# benchmarks/startup.py
+"""Measure cold-start cost: importing main and building the services.
+
+Usage (from the repository root):
+
+    python -m benchmarks.startup --runs 5 --budget 1.5
+
+Each run uses a fresh interpreter so nothing is shared between runs. The
+slowest imports are taken from python -X importtime. With --budget the
+command exits non-zero when the median import + build time exceeds it, so
+it can gate deploys. Nothing connects to MongoDB, Redis or OpenAI; missing
+credentials are filled with placeholders.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+PLACEHOLDER_ENV = {
+    "OPENAI_API_KEY": "sk-benchmark",
+    "MONGODB_CONNECTION_STRING": "mongodb://localhost:27017",
+    "TELEGRAM_BOT_TOKEN": "123456:benchmark",
+    "YOUTUBE_API_KEY": "benchmark"
+}
+
+def child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    for key, value in PLACEHOLDER_ENV.items():
+        env.setdefault(key, value)
+    return env
+
+def run_child():
+    """Import main and build the services once, printing timings as JSON."""
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+    main.services.build()
+    built = time.perf_counter()
+    print(json.dumps({
+        "import_seconds": round(imported - started, 4),
+        "build_seconds": round(built - imported, 4),
+        "modules_loaded": len(sys.modules)
+    }))
+
+def run_once() -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child"],
+        check=True, capture_output=True, text=True, env=child_env()
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def slowest_imports(limit: int) -> List[Dict[str, Any]]:
+    """Packages by cumulative import time while importing main and building services.
+
+    Counts what main imports directly and what build() imports on demand,
+    from python -X importtime.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main; main.services.build()"],
+        check=True, capture_output=True, text=True, env=child_env()
+    )
+    packages: Dict[str, int] = {}
+    children: List[tuple] = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip() == "cumulative":
+            continue
+        # Children are listed before their parent, indented two spaces per level
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        package = name.strip().split(".")[0]
+        if level == 1:
+            children.append((package, int(cumulative)))
+        elif level == 0:
+            entries = children if package == "main" else [(package, int(cumulative))]
+            for child, micros in entries:
+                packages[child] = packages.get(child, 0) + micros
+            children = []
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{"module": name, "cumulative_ms": round(micros / 1000, 1)} for name, micros in ranked]
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(values), 4),
+        "min": round(min(values), 4),
+        "max": round(max(values), 4)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest packages to list")
+    parser.add_argument("--budget", type=float, help="Fail if median import + build exceeds this many seconds")
+    parser.add_argument("--results", help="Write results as JSON to this path")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    runs = [run_once() for _ in range(args.runs)]
+    totals = [run["import_seconds"] + run["build_seconds"] for run in runs]
+    results = {
+        "runs": args.runs,
+        "import_seconds": summarize([run["import_seconds"] for run in runs]),
+        "build_seconds": summarize([run["build_seconds"] for run in runs]),
+        "total_seconds": summarize(totals),
+        "modules_loaded": runs[-1]["modules_loaded"],
+        "slowest_imports": slowest_imports(args.top)
+    }
+
+    print(f"import main:    {json.dumps(results['import_seconds'])}")
+    print(f"build services: {json.dumps(results['build_seconds'])}")
+    print(f"total:          {json.dumps(results['total_seconds'])}")
+    for item in results["slowest_imports"]:
+        print(f"  {item['cumulative_ms']:>8.1f} ms  {item['module']}")
+
+    if args.results:
+        with open(args.results, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.budget is not None:
+        within = results["total_seconds"]["median"] <= args.budget
+        print(f"budget {args.budget}s: {'ok' if within else 'exceeded'}")
+        if not within:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
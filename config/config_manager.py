@@ -1,10 +1,14 @@
 # config/config_manager.py
 
 import os
-from typing import Dict, Any
-from pydantic import BaseSettings
+from typing import Dict, Any, Optional
 from functools import lru_cache
 
+try:
+    from pydantic_settings import BaseSettings
+except ImportError:  # pydantic < 2
+    from pydantic import BaseSettings
+
 class Settings(BaseSettings):
     """Application settings"""
     
@@ -17,25 +21,116 @@ class Settings(BaseSettings):
     # Application Settings
     DEBUG: bool = False
     API_V1_PREFIX: str = "/api/v1"
+    ADMIN_API_KEY: Optional[str] = None  # X-Admin-Key for operational endpoints; unset disables them
     PROJECT_NAME: str = "Fursat.fun AI Multi-Agent"
     
     # Content Processing
     MAX_VIDEO_DURATION: int = 60  # seconds
     MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # 100MB
     SUPPORTED_VIDEO_FORMATS: list = ["mp4", "mov", "avi"]
+    VIDEO_SOURCE: str = "youtube"  # youtube or local
+    LOCAL_MEDIA_DIR: str = "media_samples"  # root for the local source
+    INGEST_MODE: str = "segment"  # segment fetches only the clip window, full downloads everything
+    DOWNLOAD_DIR: str = "downloads"
+    GENERATED_DIR: str = "generated"
+    MEDIA_DISK_BUDGET: int = 10 * 1024 * 1024 * 1024  # 10GB across both dirs
+    RENDER_BACKEND: str = "ffmpeg"  # ffmpeg or moviepy
+    CAPTION_FONTFILE: Optional[str] = None  # drawtext font; ffmpeg default when unset
+    RENDER_WORKERS: int = os.cpu_count() or 1
+    RENDER_TIMEOUT: int = 600  # seconds per render job
+    RENDITION_PLATFORMS: list = ["reels", "shorts", "tiktok"]  # rendered when a request names no known platform
+    HIGHLIGHT_SELECTION: bool = True  # cut the most engaging window instead of the opening
+    HIGHLIGHT_AUDIO: bool = True  # include loudness in the highlight score
+    HIGHLIGHT_SCAN_SECONDS: Optional[int] = 1800  # only the start of longer local sources is scanned
+    HIGHLIGHT_SEEK_SAMPLES: int = 48  # remote sources are sampled at this many seek points instead
+    
+    # OpenAI
+    OPENAI_MODEL: str = "gpt-3.5-turbo"
+    OPENAI_BASE_URL: Optional[str] = None  # OpenAI-compatible endpoint; api.openai.com when unset
+    OPENAI_RPM: int = 3500  # requests per minute quota
+    OPENAI_TPM: int = 90000  # tokens per minute quota
+    OPENAI_MAX_RETRIES: int = 5
+    OPENAI_MAX_CONNECTIONS: int = 50
+    OPENAI_TIMEOUT: int = 60  # seconds
+    TRIP_PROMPT_TOKEN_BUDGET: int = 800  # package and needs are trimmed to fit
+    TRIP_MAX_OUTPUT_TOKENS: int = 400
+    TRIP_BATCH_MAX_ITEMS: int = 100
+    TRIP_BATCH_CONCURRENCY: int = 8  # customizations run at once within one batch
+    
+    # MongoDB Connection
+    MONGODB_DATABASE: str = "fursat"
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_TIMEOUT_MS: int = 5000
     
     # MongoDB Collections
     TOURS_COLLECTION: str = "tours"
     CUSTOMIZED_TOURS_COLLECTION: str = "customized_tours"
     CONTENT_COLLECTION: str = "content"
+    JOBS_COLLECTION: str = "content_jobs"
+    POSTS_COLLECTION: str = "scheduled_posts"
+    
+    # Content Job Queue
+    JOB_BACKEND: str = "mongo"  # mongo or memory (single process only)
+    RUN_JOB_WORKERS: bool = True  # run workers inside the API process
+    JOB_WORKER_CONCURRENCY: int = 2
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_LEASE_SECONDS: int = 120
+    JOB_RETRY_BACKOFF: int = 10  # seconds, doubled per attempt
+    
+    # Publishing (backlog uses JOB_BACKEND; runs wherever job workers run)
+    PUBLISHED_DIR: str = "published"  # local publisher output
+    PUBLISH_BATCH_WINDOW: float = 1.0  # seconds; posts due this close together go out as one batch
+    PUBLISH_MAX_BATCH: int = 20
+    PUBLISH_MAX_ATTEMPTS: int = 3
+    PUBLISH_RETRY_BACKOFF: int = 60  # seconds, doubled per attempt
+    PUBLISH_RESYNC_INTERVAL: int = 30  # seconds between backlog reloads
+    PUBLISH_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+        "reels": {"calls": 25, "period": 86400},
+        "shorts": {"calls": 50, "period": 86400},
+        "tiktok": {"calls": 15, "period": 86400},
+        "feed": {"calls": 25, "period": 86400}
+    }
     
     # Cache Settings
-    REDIS_URL: str = os.getenv("REDIS_URL")
+    REDIS_URL: Optional[str] = None  # caches and limits stay in process memory when unset
     CACHE_TTL: int = 3600  # 1 hour
+    TOUR_CACHE_SIZE: int = 1024
+    TOUR_CACHE_LOCAL_TTL: int = 60  # bounds staleness across workers
+    LLM_CACHE_BACKEND: str = "mongo"  # mongo, redis or memory
+    LLM_CACHE_COLLECTION: str = "llm_cache"
+    LLM_CACHE_SIZE: int = 2048
+    LLM_CACHE_TTL: int = 7 * 24 * 3600  # 1 week
+    
+    # Agent Concurrency (per message type)
+    AGENT_LIMITS: Dict[str, Dict[str, float]] = {
+        "trip_planner": {"max_in_flight": 16, "max_queue": 64, "timeout": 60},
+        "trip_planner_batch": {"max_in_flight": 4, "max_queue": 16, "timeout": 300},
+        "content_creator": {"max_in_flight": 2, "max_queue": 32, "timeout": 1200}
+    }
     
-    # Rate Limiting
+    # Webhooks
+    TELEGRAM_WEBHOOK_SECRET: Optional[str] = None  # secret_token given to setWebhook
+    WEBHOOK_DEDUP_SIZE: int = 10000  # recently seen delivery ids kept per webhook
+    WEBHOOK_MAX_PENDING: int = 256  # deliveries accepted but not yet finished per webhook
+    WHATSAPP_CONCURRENCY: int = 16  # batched messages routed at once
+    
+    # Rate Limiting (per API client, Telegram chat or WhatsApp sender)
     RATE_LIMIT_CALLS: int = 100
     RATE_LIMIT_PERIOD: int = 3600  # 1 hour
+    RATE_LIMIT_BACKEND: str = "memory"  # memory (per process) or redis (shared, uses REDIS_URL)
+    RATE_LIMIT_TRUST_PROXY: bool = False  # key clients by X-Forwarded-For
+    
+    # Logging (written by a background thread)
+    LOG_FILE: str = "logs/fursat_ai.log"
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json or text
+    LOG_MAX_BYTES: int = 50 * 1024 * 1024  # rotate at 50MB
+    LOG_BACKUP_COUNT: int = 5
+    LOG_QUEUE_SIZE: int = 10000  # records waiting for the writer; more are dropped
+    LOG_MAX_FIELD_CHARS: int = 2000  # longer messages and values are truncated
+    LOG_SAMPLE_RATES: Dict[str, float] = {"debug": 0.01, "activity": 0.1}  # fraction of traces kept
+    LOG_REDACT_KEYS: list = ["token", "secret", "password", "api_key", "authorization", "cookie"]
     
     class Config:
         case_sensitive = True
@@ -70,9 +165,14 @@ class ConfigManager:
         """Get MongoDB configuration"""
         return {
             "connection_string": self.settings.MONGODB_CONNECTION_STRING,
+            "database": self.settings.MONGODB_DATABASE,
+            "max_pool_size": self.settings.MONGODB_MAX_POOL_SIZE,
+            "min_pool_size": self.settings.MONGODB_MIN_POOL_SIZE,
+            "timeout_ms": self.settings.MONGODB_TIMEOUT_MS,
             "tours_collection": self.settings.TOURS_COLLECTION,
             "customized_tours_collection": self.settings.CUSTOMIZED_TOURS_COLLECTION,
-            "content_collection": self.settings.CONTENT_COLLECTION
+            "content_collection": self.settings.CONTENT_COLLECTION,
+            "jobs_collection": self.settings.JOBS_COLLECTION
         }
     
     def get_api_keys(self) -> Dict[str, str]:
@@ -83,24 +183,114 @@ class ConfigManager:
             "telegram": self.settings.TELEGRAM_BOT_TOKEN
         }
     
+    def get_openai_settings(self) -> Dict[str, Any]:
+        """Get OpenAI client and quota settings"""
+        return {
+            "model": self.settings.OPENAI_MODEL,
+            "base_url": self.settings.OPENAI_BASE_URL,
+            "requests_per_minute": self.settings.OPENAI_RPM,
+            "tokens_per_minute": self.settings.OPENAI_TPM,
+            "max_retries": self.settings.OPENAI_MAX_RETRIES,
+            "max_connections": self.settings.OPENAI_MAX_CONNECTIONS,
+            "timeout": self.settings.OPENAI_TIMEOUT,
+            "trip_prompt_token_budget": self.settings.TRIP_PROMPT_TOKEN_BUDGET,
+            "trip_max_output_tokens": self.settings.TRIP_MAX_OUTPUT_TOKENS,
+            "trip_batch_max_items": self.settings.TRIP_BATCH_MAX_ITEMS,
+            "trip_batch_concurrency": self.settings.TRIP_BATCH_CONCURRENCY
+        }
+    
     def get_content_settings(self) -> Dict[str, Any]:
         """Get content processing settings"""
         return {
             "max_duration": self.settings.MAX_VIDEO_DURATION,
             "max_size": self.settings.MAX_UPLOAD_SIZE,
-            "supported_formats": self.settings.SUPPORTED_VIDEO_FORMATS
+            "supported_formats": self.settings.SUPPORTED_VIDEO_FORMATS,
+            "video_source": self.settings.VIDEO_SOURCE,
+            "local_media_dir": self.settings.LOCAL_MEDIA_DIR,
+            "ingest_mode": self.settings.INGEST_MODE,
+            "download_dir": self.settings.DOWNLOAD_DIR,
+            "generated_dir": self.settings.GENERATED_DIR,
+            "media_disk_budget": self.settings.MEDIA_DISK_BUDGET,
+            "render_backend": self.settings.RENDER_BACKEND,
+            "caption_fontfile": self.settings.CAPTION_FONTFILE,
+            "render_workers": self.settings.RENDER_WORKERS,
+            "render_timeout": self.settings.RENDER_TIMEOUT,
+            "rendition_platforms": self.settings.RENDITION_PLATFORMS,
+            "highlight_selection": self.settings.HIGHLIGHT_SELECTION,
+            "highlight_audio": self.settings.HIGHLIGHT_AUDIO,
+            "highlight_scan_seconds": self.settings.HIGHLIGHT_SCAN_SECONDS,
+            "highlight_seek_samples": self.settings.HIGHLIGHT_SEEK_SAMPLES
+        }
+    
+    def get_job_settings(self) -> Dict[str, Any]:
+        """Get content job queue settings"""
+        return {
+            "backend": self.settings.JOB_BACKEND,
+            "run_workers": self.settings.RUN_JOB_WORKERS,
+            "concurrency": self.settings.JOB_WORKER_CONCURRENCY,
+            "max_attempts": self.settings.JOB_MAX_ATTEMPTS,
+            "lease_seconds": self.settings.JOB_LEASE_SECONDS,
+            "retry_backoff": self.settings.JOB_RETRY_BACKOFF
+        }
+    
+    def get_publish_settings(self) -> Dict[str, Any]:
+        """Get publish scheduler settings"""
+        return {
+            "posts_collection": self.settings.POSTS_COLLECTION,
+            "published_dir": self.settings.PUBLISHED_DIR,
+            "batch_window": self.settings.PUBLISH_BATCH_WINDOW,
+            "max_batch": self.settings.PUBLISH_MAX_BATCH,
+            "max_attempts": self.settings.PUBLISH_MAX_ATTEMPTS,
+            "retry_backoff": self.settings.PUBLISH_RETRY_BACKOFF,
+            "resync_interval": self.settings.PUBLISH_RESYNC_INTERVAL,
+            "rate_limits": self.settings.PUBLISH_RATE_LIMITS
         }
     
     def get_cache_settings(self) -> Dict[str, Any]:
         """Get cache settings"""
         return {
             "redis_url": self.settings.REDIS_URL,
-            "ttl": self.settings.CACHE_TTL
+            "ttl": self.settings.CACHE_TTL,
+            "tour_cache_size": self.settings.TOUR_CACHE_SIZE,
+            "tour_cache_local_ttl": self.settings.TOUR_CACHE_LOCAL_TTL,
+            "llm_cache_backend": self.settings.LLM_CACHE_BACKEND,
+            "llm_cache_collection": self.settings.LLM_CACHE_COLLECTION,
+            "llm_cache_size": self.settings.LLM_CACHE_SIZE,
+            "llm_cache_ttl": self.settings.LLM_CACHE_TTL
+        }
+    
+    def get_agent_limits(self) -> Dict[str, Dict[str, float]]:
+        """Get per-agent concurrency limits"""
+        return self.settings.AGENT_LIMITS
+    
+    def get_webhook_settings(self) -> Dict[str, Any]:
+        """Get webhook settings"""
+        return {
+            "telegram_secret": self.settings.TELEGRAM_WEBHOOK_SECRET,
+            "dedup_size": self.settings.WEBHOOK_DEDUP_SIZE,
+            "max_pending": self.settings.WEBHOOK_MAX_PENDING,
+            "whatsapp_concurrency": self.settings.WHATSAPP_CONCURRENCY
+        }
+    
+    def get_logging_settings(self) -> Dict[str, Any]:
+        """Get logging settings"""
+        return {
+            "file": self.settings.LOG_FILE,
+            "level": self.settings.LOG_LEVEL,
+            "format": self.settings.LOG_FORMAT,
+            "max_bytes": self.settings.LOG_MAX_BYTES,
+            "backup_count": self.settings.LOG_BACKUP_COUNT,
+            "queue_size": self.settings.LOG_QUEUE_SIZE,
+            "max_field_chars": self.settings.LOG_MAX_FIELD_CHARS,
+            "sample_rates": self.settings.LOG_SAMPLE_RATES,
+            "redact_keys": self.settings.LOG_REDACT_KEYS
         }
     
-    def get_rate_limit_settings(self) -> Dict[str, int]:
+    def get_rate_limit_settings(self) -> Dict[str, Any]:
         """Get rate limiting settings"""
         return {
             "calls": self.settings.RATE_LIMIT_CALLS,
-            "period": self.settings.RATE_LIMIT_PERIOD
+            "period": self.settings.RATE_LIMIT_PERIOD,
+            "backend": self.settings.RATE_LIMIT_BACKEND,
+            "trust_proxy": self.settings.RATE_LIMIT_TRUST_PROXY
         }
\ No newline at end of file
@@ -1,8 +1,30 @@
 # core/agent_base.py
 
 from abc import ABC, abstractmethod
+import asyncio
+from contextlib import asynccontextmanager
+import copy
+import hashlib
+import json
 import logging
-from typing import Dict, Any
+import time
+from typing import AsyncIterator, Dict, Any, Optional
+
+from core.agent_limits import (
+    AgentBusyError,
+    AgentLimiter,
+    AgentTimeoutError,
+    PRIORITY_INTERACTIVE
+)
+from core.jobs import job_stage
+from core.metrics import ROUTE_SECONDS, observe_stage, response_outcome
+from core.singleflight import SingleFlight
+
+STATUS_BUSY = "busy"
+STATUS_TIMEOUT = "timeout"
+
+# Message fields that describe delivery rather than the work requested
+TRANSPORT_FIELDS = ("priority", "trace_id")
 
 class BaseAgent(ABC):
     """Base class for all agents in the system."""
@@ -16,30 +38,195 @@ class BaseAgent(ABC):
         """Process incoming messages and return response."""
         pass
     
-    def log_activity(self, activity: str):
-        """Log agent activity with timestamp."""
-        self.logger.info(f"[{self.name}] {activity}")
+    async def stream_message(self, message: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Process a message as a stream of {"event", "data"} events.
+
+        Agents that can produce partial output override this; by default the
+        full response is sent as a single "done" event.
+        """
+        response = await self.process_message(message)
+        yield {"event": "error" if "error" in response else "done", "data": response}
+    
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """Time a named stage of this agent's work.
+
+        The duration goes to the fursat_agent_stage_seconds histogram and,
+        when running as a content job, the stage is recorded on the job.
+        """
+        with observe_stage(self.name, name):
+            async with job_stage(name):
+                yield
+    
+    def log_activity(self, activity: str, *args: Any):
+        """Log agent activity; args are %-formatted only if the record is kept."""
+        self.logger.info(f"[{self.name}] {activity}", *args, extra={"activity": True})
 
 class AgentRouter:
     """Routes messages to appropriate agents based on message type and content."""
     
     def __init__(self):
         self.agents = {}
+        self.limiters: Dict[str, AgentLimiter] = {}
+        self.coalesced = set()
+        self.flights = SingleFlight()
         self.logger = logging.getLogger("AgentRouter")
     
-    def register_agent(self, message_type: str, agent: BaseAgent):
-        """Register an agent to handle specific message types."""
+    def register_agent(
+        self,
+        message_type: str,
+        agent: BaseAgent,
+        limiter: Optional[AgentLimiter] = None,
+        coalesce: bool = False
+    ):
+        """Register an agent to handle specific message types.
+
+        With coalesce, identical messages that arrive while one is being
+        processed share that execution and its result.
+        """
         self.agents[message_type] = agent
+        if limiter:
+            self.limiters[message_type] = limiter
+        if coalesce:
+            self.coalesced.add(message_type)
         self.logger.info(f"Registered agent {agent.name} for message type {message_type}")
     
     async def route_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """Route message to appropriate agent and return response."""
         message_type = message.get("type", "default")
-        
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._route(message_type, message)
+            outcome = response_outcome(response)
+            return response
+        finally:
+            labels = (message_type if message_type in self.agents else "unknown", outcome)
+            ROUTE_SECONDS.labels(*labels).observe(time.perf_counter() - started)
+
+    async def _route(self, message_type: str, message: Dict[str, Any]) -> Dict[str, Any]:
         if message_type in self.agents:
-            agent = self.agents[message_type]
-            agent.log_activity(f"Processing message: {message}")
-            return await agent.process_message(message)
+            if message_type not in self.coalesced:
+                return await self._dispatch(message_type, message)
+
+            response = await self.flights.do(
+                self._coalescing_key(message),
+                lambda: self._dispatch(message_type, message)
+            )
+            # Every caller gets its own copy of the shared response
+            return copy.deepcopy(response)
         else:
             self.logger.warning(f"No agent registered for message type: {message_type}")
-            return {"error": "No agent available for this message type"}
\ No newline at end of file
+            return {"error": "No agent available for this message type"}
+
+    async def stream_message(self, message: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Route message to its agent and stream the agent's events.
+
+        The first event is sent straight away: a busy error, or a "status"
+        event saying whether the stream is running or queued for a slot.
+        The agent then runs in its own task under the limiter, so the slot
+        is bound by the limiter's timeout and freed as soon as the agent is
+        done, however slowly the caller reads. Streams are not coalesced,
+        since each caller consumes its own event stream.
+        """
+        message_type = message.get("type", "default")
+        agent = self.agents.get(message_type)
+        if agent is None:
+            self.logger.warning(f"No agent registered for message type: {message_type}")
+            yield {"event": "error", "data": {"error": "No agent available for this message type"}}
+            return
+
+        agent.log_activity("Streaming message: %s", message)
+        limiter = self.limiters.get(message_type)
+        if limiter is None:
+            async for event in agent.stream_message(message):
+                yield event
+            return
+
+        if limiter.at_capacity:
+            yield self._busy_event(agent, limiter.retry_after())
+            return
+        if limiter.would_wait:
+            status = {"status": "queued", "position": limiter.queued + 1}
+        else:
+            status = {"status": "running"}
+
+        events: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._run_stream(agent, limiter, message, events))
+        try:
+            yield {"event": "status", "data": status}
+            while True:
+                event = await events.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            # The caller went away; stop the agent and free its slot
+            producer.cancel()
+
+    async def _run_stream(
+        self,
+        agent: BaseAgent,
+        limiter: AgentLimiter,
+        message: Dict[str, Any],
+        events: asyncio.Queue
+    ):
+        """Put the agent's events on events, ending with None."""
+        async def produce():
+            async for event in agent.stream_message(message):
+                events.put_nowait(event)
+
+        try:
+            await limiter.run(produce, message.get("priority", PRIORITY_INTERACTIVE))
+        except AgentBusyError as e:
+            events.put_nowait(self._busy_event(agent, e.retry_after))
+        except AgentTimeoutError as e:
+            self.logger.warning(f"Agent {agent.name} stream timed out: {str(e)}")
+            events.put_nowait({
+                "event": "error",
+                "data": {"error": f"{agent.name} did not respond in time", "status": STATUS_TIMEOUT}
+            })
+        finally:
+            events.put_nowait(None)
+
+    def _busy_event(self, agent: BaseAgent, retry_after: int) -> Dict[str, Any]:
+        self.logger.warning(f"Agent {agent.name} is busy, rejecting stream")
+        return {
+            "event": "error",
+            "data": {
+                "error": f"{agent.name} is busy, please retry later",
+                "status": STATUS_BUSY,
+                "retry_after": retry_after
+            }
+        }
+
+    def _coalescing_key(self, message: Dict[str, Any]) -> str:
+        work = {key: value for key, value in message.items() if key not in TRANSPORT_FIELDS}
+        payload = json.dumps(work, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _dispatch(self, message_type: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        agent = self.agents[message_type]
+        agent.log_activity("Processing message: %s", message)
+        limiter = self.limiters.get(message_type)
+        if limiter is None:
+            return await agent.process_message(message)
+
+        try:
+            return await limiter.run(
+                lambda: agent.process_message(message),
+                message.get("priority", PRIORITY_INTERACTIVE)
+            )
+        except AgentBusyError as e:
+            self.logger.warning(f"Agent {agent.name} is busy, rejecting message")
+            return {
+                "error": f"{agent.name} is busy, please retry later",
+                "status": STATUS_BUSY,
+                "retry_after": e.retry_after
+            }
+        except AgentTimeoutError as e:
+            self.logger.warning(f"Agent {agent.name} timed out: {str(e)}")
+            return {
+                "error": f"{agent.name} did not respond in time",
+                "status": STATUS_TIMEOUT
+            }
@@ -0,0 +1,125 @@
+# core/agent_limits.py
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+
+# Lower value is served first
+PRIORITY_ORDER = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 1}
+
+class AgentBusyError(Exception):
+    """The agent is at capacity and its wait queue is full."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AgentTimeoutError(Exception):
+    """A call waited for or ran on an agent longer than its deadline."""
+
+class AgentLimiter:
+    """Bounds concurrent calls into one agent.
+
+    Up to max_in_flight calls run at once and up to max_queue more wait for a
+    slot. Interactive callers are served before background ones. Each call,
+    including its time in the queue, must finish within timeout seconds.
+    """
+
+    def __init__(self, max_in_flight: int = 4, max_queue: int = 16, timeout: float = 60):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        # Moving average of call duration, used to suggest a Retry-After
+        self._avg_duration = 1.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def would_wait(self) -> bool:
+        """Whether a new caller would have to queue for a slot."""
+        return self.in_flight >= self.max_in_flight or bool(self._waiters)
+
+    @property
+    def at_capacity(self) -> bool:
+        """Whether a new caller would be rejected with AgentBusyError."""
+        return self.would_wait and len(self._waiters) >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Estimated seconds until a slot frees up for a new caller."""
+        backlog = (self.queued + 1) / max(self.max_in_flight, 1)
+        return max(1, math.ceil(self._avg_duration * backlog))
+
+    async def run(self, coro_factory, priority: str = PRIORITY_INTERACTIVE) -> Any:
+        """Run coro_factory() once a slot is free, within the deadline."""
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self.slot(priority):
+                    started = time.monotonic()
+                    try:
+                        return await coro_factory()
+                    finally:
+                        elapsed = time.monotonic() - started
+                        self._avg_duration = 0.8 * self._avg_duration + 0.2 * elapsed
+        except TimeoutError:
+            raise AgentTimeoutError(f"Timed out after {self.timeout}s")
+
+    @asynccontextmanager
+    async def slot(self, priority: str = PRIORITY_INTERACTIVE):
+        """Hold a slot for the body of the block, without a deadline of its own."""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: str):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise AgentBusyError("Agent is at capacity", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (PRIORITY_ORDER.get(priority, 0), next(self._sequence), waiter)
+        heapq.heappush(self._waiters, entry)
+        try:
+            # The releasing call hands its slot over, so in_flight is unchanged
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as we gave up; pass it on
+                self._release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def _release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "avg_duration": round(self._avg_duration, 3)
+        }
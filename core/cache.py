@@ -0,0 +1,191 @@
+# core/cache.py
+
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from bson import json_util
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional
+    aioredis = None
+
+MISSING = object()
+
+class TTLCache:
+    """In-process LRU cache with a per-entry time to live."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        """Return the cached value or MISSING if absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RedisCache:
+    """Shared cache tier backed by Redis, storing values as extended JSON."""
+
+    def __init__(self, url: str, ttl: int = 3600, namespace: str = "fursat"):
+        if aioredis is None:
+            raise RuntimeError("redis package is required for the Redis cache tier")
+        self.client = aioredis.from_url(url)
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Any:
+        raw = await self.client.get(self._key(key))
+        if raw is None:
+            return MISSING
+        return json_util.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        await self.client.set(
+            self._key(key),
+            json_util.dumps(value),
+            ex=self.ttl if ttl is None else ttl
+        )
+
+    async def delete(self, key: str):
+        await self.client.delete(self._key(key))
+
+    async def close(self):
+        await self.client.close()
+
+class MongoCache:
+    """Persistent cache tier stored in a MongoDB collection with a TTL index."""
+
+    def __init__(self, database: Any, collection_name: str, ttl: int = 3600):
+        self.database = database
+        self.collection_name = collection_name
+        self.ttl = ttl
+
+    @property
+    def collection(self):
+        return self.database.collection(self.collection_name)
+
+    async def ensure_indexes(self):
+        """Let MongoDB expire entries on its own once expires_at has passed."""
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Any:
+        # The TTL monitor only runs once a minute, so check expiry here as well
+        doc = await self.collection.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}}
+        )
+        if doc is None:
+            return MISSING
+        return doc["value"]
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl if ttl is None else ttl)
+        await self.collection.replace_one(
+            {"_id": key},
+            {"_id": key, "value": value, "expires_at": expires_at},
+            upsert=True
+        )
+
+    async def delete(self, key: str):
+        await self.collection.delete_one({"_id": key})
+
+class ReadThroughCache:
+    """Two-tier read-through cache: in-process LRU in front of an optional shared tier."""
+
+    def __init__(self, name: str, local: TTLCache, remote: Optional[Any] = None):
+        self.name = name
+        self.local = local
+        self.remote = remote
+        self.logger = logging.getLogger(f"Cache.{name}")
+        self.stats = {"local_hits": 0, "remote_hits": 0, "misses": 0}
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, calling loader on a miss in every tier."""
+        value = await self.get(key)
+        if value is not MISSING:
+            return value
+
+        self.stats["misses"] += 1
+        value = await loader()
+        if value is not None:
+            await self.set(key, value)
+        return value
+
+    async def get(self, key: str) -> Any:
+        """Look up key in each tier without loading; returns MISSING on a miss."""
+        value = self.local.get(key)
+        if value is not MISSING:
+            self.stats["local_hits"] += 1
+            return value
+
+        if self.remote is not None:
+            try:
+                value = await self.remote.get(key)
+            except Exception as e:
+                self.logger.error(f"Error reading remote cache: {str(e)}")
+                value = MISSING
+            if value is not MISSING:
+                self.stats["remote_hits"] += 1
+                self.local.set(key, value)
+                return value
+
+        return MISSING
+
+    async def set(self, key: str, value: Any):
+        """Write a value through every tier."""
+        self.local.set(key, value)
+        if self.remote is not None:
+            try:
+                await self.remote.set(key, value)
+            except Exception as e:
+                self.logger.error(f"Error writing remote cache: {str(e)}")
+
+    async def invalidate(self, key: str):
+        """Drop key from every tier."""
+        self.local.delete(key)
+        if self.remote is not None:
+            try:
+                await self.remote.delete(key)
+            except Exception as e:
+                self.logger.error(f"Error invalidating remote cache: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the overall hit rate."""
+        hits = self.stats["local_hits"] + self.stats["remote_hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self.local),
+            "hit_rate": hits / total if total else 0.0
+        }
@@ -0,0 +1,226 @@
+# core/database.py
+
+import copy
+import logging
+from typing import Dict, Any, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from core.cache import MISSING, ReadThroughCache
+
+# Error code MongoDB reports for unique index violations
+DUPLICATE_KEY_ERROR = 11000
+
+class Database:
+    """Owns the shared async MongoDB client and its connection pool."""
+
+    def __init__(
+        self,
+        connection_string: str,
+        database_name: str = "fursat",
+        max_pool_size: int = 100,
+        min_pool_size: int = 0,
+        timeout_ms: int = 5000
+    ):
+        self.connection_string = connection_string
+        self.database_name = database_name
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.timeout_ms = timeout_ms
+        self.logger = logging.getLogger("Database")
+        self._client: Optional[AsyncIOMotorClient] = None
+
+    async def connect(self):
+        """Open the client; must be called from the running event loop."""
+        if self._client is not None:
+            return
+        self._client = AsyncIOMotorClient(
+            self.connection_string,
+            maxPoolSize=self.max_pool_size,
+            minPoolSize=self.min_pool_size,
+            serverSelectionTimeoutMS=self.timeout_ms
+        )
+        self.logger.info(
+            f"Connected to MongoDB database {self.database_name} "
+            f"(pool {self.min_pool_size}-{self.max_pool_size})"
+        )
+
+    async def close(self):
+        """Close the client and release pooled connections."""
+        if self._client is None:
+            return
+        self._client.close()
+        self._client = None
+        self.logger.info("Closed MongoDB connection")
+
+    @property
+    def db(self) -> AsyncIOMotorDatabase:
+        if self._client is None:
+            raise RuntimeError("Database is not connected; call connect() on startup")
+        return self._client[self.database_name]
+
+    def collection(self, name: str) -> AsyncIOMotorCollection:
+        """Get a collection from the connected database."""
+        return self.db[name]
+
+    async def ping(self) -> bool:
+        """Check that the server is reachable."""
+        try:
+            await self.db.command("ping")
+            return True
+        except Exception as e:
+            self.logger.error(f"MongoDB ping failed: {str(e)}")
+            return False
+
+class TourRepository:
+    """Async data access for base and customized tour packages."""
+
+    def __init__(
+        self,
+        database: Database,
+        tours_collection: str = "tours",
+        customized_tours_collection: str = "customized_tours",
+        cache: Optional[ReadThroughCache] = None
+    ):
+        self.database = database
+        self.tours_collection = tours_collection
+        self.customized_tours_collection = customized_tours_collection
+        self.cache = cache
+
+    @property
+    def tours(self) -> AsyncIOMotorCollection:
+        return self.database.collection(self.tours_collection)
+
+    @property
+    def customized_tours(self) -> AsyncIOMotorCollection:
+        return self.database.collection(self.customized_tours_collection)
+
+    async def get_tour(self, tour_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch a base tour package by id, reading through the cache if configured."""
+        if self.cache is None:
+            return await self.tours.find_one({"_id": tour_id})
+
+        tour = await self.cache.get_or_load(
+            self._cache_key(tour_id),
+            lambda: self.tours.find_one({"_id": tour_id})
+        )
+        # Callers may modify the package, so never hand out the cached object
+        return copy.deepcopy(tour)
+
+    async def get_tours(self, tour_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch several base tours with a single query for the ones not cached.
+
+        Returns the tours found, keyed by id; missing ids are left out.
+        """
+        tours: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for tour_id in dict.fromkeys(tour_ids):
+            cached = MISSING if self.cache is None else await self.cache.get(self._cache_key(tour_id))
+            if cached is MISSING or cached is None:
+                missing.append(tour_id)
+            else:
+                tours[tour_id] = cached
+
+        if missing:
+            if self.cache is not None:
+                self.cache.stats["misses"] += len(missing)
+            async for tour in self.tours.find({"_id": {"$in": missing}}):
+                tours[tour["_id"]] = tour
+                if self.cache is not None:
+                    await self.cache.set(self._cache_key(tour["_id"]), tour)
+
+        return copy.deepcopy(tours)
+
+    async def update_tour(self, tour_id: str, changes: Dict[str, Any]) -> bool:
+        """Apply changes to a base tour and invalidate its cached copy."""
+        result = await self.tours.update_one({"_id": tour_id}, {"$set": changes})
+        await self.invalidate_tour(tour_id)
+        return result.matched_count > 0
+
+    async def invalidate_tour(self, tour_id: str):
+        """Drop a tour from the cache after it changed outside this repository."""
+        if self.cache is not None:
+            await self.cache.invalidate(self._cache_key(tour_id))
+
+    def _cache_key(self, tour_id: str) -> str:
+        return f"tour:{tour_id}"
+
+    async def ensure_indexes(self):
+        """One customized package per idempotency key."""
+        await self.customized_tours.create_index(
+            "idempotency_key",
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$type": "string"}}
+        )
+
+    async def find_customized_tour(self, idempotency_key: str) -> Optional[Dict[str, Any]]:
+        """Find a customized package previously saved under idempotency_key."""
+        return await self.customized_tours.find_one(
+            {"idempotency_key": idempotency_key},
+            {"_id": 1}
+        )
+
+    async def find_customized_tours(self, idempotency_keys: List[str]) -> Dict[str, Any]:
+        """Ids of customized packages already saved under any of idempotency_keys, keyed by key."""
+        if not idempotency_keys:
+            return {}
+        cursor = self.customized_tours.find(
+            {"idempotency_key": {"$in": list(set(idempotency_keys))}},
+            {"_id": 1, "idempotency_key": 1}
+        )
+        return {doc["idempotency_key"]: doc["_id"] async for doc in cursor}
+
+    async def insert_customized_tours(self, packages: List[Dict[str, Any]]) -> List[Any]:
+        """Insert customized packages in one round trip and return their ids in order.
+
+        Packages whose idempotency key was saved concurrently by another
+        request resolve to the existing id, as in insert_customized_tour.
+        The insert is unordered, so one bad document does not stop the
+        rest; a package that could not be saved gets its error, as an
+        exception, in place of an id.
+        """
+        if not packages:
+            return []
+        try:
+            result = await self.customized_tours.insert_many(packages, ordered=False)
+            return list(result.inserted_ids)
+        except BulkWriteError as e:
+            write_errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+        duplicates = [
+            index for index, error in write_errors.items()
+            if error.get("code") == DUPLICATE_KEY_ERROR and packages[index].get("idempotency_key")
+        ]
+        existing = await self.find_customized_tours([
+            packages[index]["idempotency_key"] for index in duplicates
+        ])
+        ids = []
+        for index, package in enumerate(packages):
+            error = write_errors.get(index)
+            if error is None:
+                ids.append(package["_id"])
+                continue
+            package.pop("_id", None)
+            package_id = existing.get(package.get("idempotency_key")) if index in duplicates else None
+            if package_id is not None:
+                ids.append(package_id)
+            else:
+                ids.append(RuntimeError(error.get("errmsg", "Could not save customized package")))
+        return ids
+
+    async def insert_customized_tour(self, package: Dict[str, Any]) -> Any:
+        """Insert a customized package and return its id.
+
+        If another request already saved a package with the same idempotency
+        key, the existing id is returned instead.
+        """
+        try:
+            result = await self.customized_tours.insert_one(package)
+            return result.inserted_id
+        except DuplicateKeyError:
+            if not package.get("idempotency_key"):
+                raise
+            package.pop("_id", None)
+            existing = await self.find_customized_tour(package["idempotency_key"])
+            return existing["_id"]
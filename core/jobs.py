@@ -0,0 +1,370 @@
+# core/jobs.py
+
+import asyncio
+import contextvars
+import copy
+import logging
+import random
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from core.metrics import trace_id
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+STAGE_RUNNING = "running"
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+
+class PermanentJobError(Exception):
+    """A job failed in a way retrying cannot fix, such as an invalid input."""
+
+def _new_job(job_type: str, payload: Dict[str, Any], max_attempts: int) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        "_id": uuid.uuid4().hex,
+        "type": job_type,
+        "payload": payload,
+        "status": JOB_QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "available_at": now,
+        "lease_expires_at": None,
+        "worker_id": None,
+        "stages": {},
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+class MongoJobQueue:
+    """Durable job queue stored in MongoDB.
+
+    Jobs are claimed with a lease; a job whose worker dies is handed out
+    again once the lease expires, so delivery is at-least-once.
+    """
+
+    def __init__(self, database: Any, collection_name: str = "content_jobs"):
+        self.database = database
+        self.collection_name = collection_name
+
+    @property
+    def collection(self):
+        return self.database.collection(self.collection_name)
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("status", 1), ("available_at", 1)])
+        await self.collection.create_index([("status", 1), ("lease_expires_at", 1)])
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any], max_attempts: int = 3) -> str:
+        job = _new_job(job_type, payload, max_attempts)
+        await self.collection.insert_one(job)
+        return job["_id"]
+
+    async def claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Atomically take the next available job, or reclaim one with an expired lease."""
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": JOB_QUEUED, "available_at": {"$lte": now}},
+                {"status": JOB_RUNNING, "lease_expires_at": {"$lte": now}}
+            ]},
+            {
+                "$set": {
+                    "status": JOB_RUNNING,
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def extend_lease(self, job_id: str, worker_id: str, lease_seconds: float):
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": job_id, "worker_id": worker_id, "status": JOB_RUNNING},
+            {"$set": {"lease_expires_at": now + timedelta(seconds=lease_seconds), "updated_at": now}}
+        )
+
+    async def update_stage(self, job_id: str, stage: str, status: str, error: Optional[str] = None):
+        now = datetime.utcnow()
+        changes = {f"stages.{stage}.status": status, "updated_at": now}
+        if status == STAGE_RUNNING:
+            changes[f"stages.{stage}.started_at"] = now
+        else:
+            changes[f"stages.{stage}.finished_at"] = now
+        if error:
+            changes[f"stages.{stage}.error"] = error
+        await self.collection.update_one({"_id": job_id}, {"$set": changes})
+
+    async def set_stage_progress(self, job_id: str, stage: str, progress: float):
+        await self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {f"stages.{stage}.progress": progress, "updated_at": datetime.utcnow()}}
+        )
+
+    async def complete(self, job_id: str, result: Dict[str, Any]):
+        await self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {
+                "status": JOB_SUCCEEDED,
+                "result": result,
+                "error": None,
+                "lease_expires_at": None,
+                "updated_at": datetime.utcnow()
+            }}
+        )
+
+    async def fail(self, job_id: str, error: str, retry_at: Optional[datetime] = None):
+        """Record a failed attempt, re-queueing the job if retry_at is given."""
+        changes = {
+            "status": JOB_QUEUED if retry_at else JOB_FAILED,
+            "error": error,
+            "lease_expires_at": None,
+            "updated_at": datetime.utcnow()
+        }
+        if retry_at:
+            changes["available_at"] = retry_at
+        await self.collection.update_one({"_id": job_id}, {"$set": changes})
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": job_id})
+
+    async def count_pending(self) -> int:
+        return await self.collection.count_documents({"status": JOB_QUEUED})
+
+    async def count_active(self) -> int:
+        """Jobs queued or running."""
+        return await self.collection.count_documents({"status": {"$in": [JOB_QUEUED, JOB_RUNNING]}})
+
+class InMemoryJobQueue:
+    """Process-local stand-in for MongoJobQueue, for development and tests."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def ensure_indexes(self):
+        pass
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any], max_attempts: int = 3) -> str:
+        job = _new_job(job_type, payload, max_attempts)
+        self._jobs[job["_id"]] = job
+        return job["_id"]
+
+    async def claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        candidates: List[Dict[str, Any]] = [
+            job for job in self._jobs.values()
+            if (job["status"] == JOB_QUEUED and job["available_at"] <= now)
+            or (job["status"] == JOB_RUNNING and job["lease_expires_at"] <= now)
+        ]
+        if not candidates:
+            return None
+
+        job = min(candidates, key=lambda item: item["available_at"])
+        job.update({
+            "status": JOB_RUNNING,
+            "worker_id": worker_id,
+            "lease_expires_at": now + timedelta(seconds=lease_seconds),
+            "updated_at": now
+        })
+        job["attempts"] += 1
+        return copy.deepcopy(job)
+
+    async def extend_lease(self, job_id: str, worker_id: str, lease_seconds: float):
+        job = self._jobs.get(job_id)
+        if job and job["worker_id"] == worker_id and job["status"] == JOB_RUNNING:
+            job["lease_expires_at"] = datetime.utcnow() + timedelta(seconds=lease_seconds)
+
+    async def update_stage(self, job_id: str, stage: str, status: str, error: Optional[str] = None):
+        now = datetime.utcnow()
+        entry = self._jobs[job_id]["stages"].setdefault(stage, {})
+        entry["status"] = status
+        entry["started_at" if status == STAGE_RUNNING else "finished_at"] = now
+        if error:
+            entry["error"] = error
+        self._jobs[job_id]["updated_at"] = now
+
+    async def set_stage_progress(self, job_id: str, stage: str, progress: float):
+        self._jobs[job_id]["stages"].setdefault(stage, {})["progress"] = progress
+        self._jobs[job_id]["updated_at"] = datetime.utcnow()
+
+    async def complete(self, job_id: str, result: Dict[str, Any]):
+        self._jobs[job_id].update({
+            "status": JOB_SUCCEEDED,
+            "result": result,
+            "error": None,
+            "lease_expires_at": None,
+            "updated_at": datetime.utcnow()
+        })
+
+    async def fail(self, job_id: str, error: str, retry_at: Optional[datetime] = None):
+        job = self._jobs[job_id]
+        job.update({
+            "status": JOB_QUEUED if retry_at else JOB_FAILED,
+            "error": error,
+            "lease_expires_at": None,
+            "updated_at": datetime.utcnow()
+        })
+        if retry_at:
+            job["available_at"] = retry_at
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return copy.deepcopy(job) if job else None
+
+    async def count_pending(self) -> int:
+        return sum(1 for job in self._jobs.values() if job["status"] == JOB_QUEUED)
+
+    async def count_active(self) -> int:
+        return sum(1 for job in self._jobs.values() if job["status"] in (JOB_QUEUED, JOB_RUNNING))
+
+# Job being processed by the current task, used for stage reporting
+_current_job: contextvars.ContextVar = contextvars.ContextVar("current_job", default=None)
+
+@asynccontextmanager
+async def job_stage(name: str):
+    """Record the progress of a named stage on the current job, if there is one."""
+    current = _current_job.get()
+    if current is None:
+        yield
+        return
+
+    queue, job_id = current
+    await queue.update_stage(job_id, name, STAGE_RUNNING)
+    try:
+        yield
+    except Exception as e:
+        await queue.update_stage(job_id, name, STAGE_FAILED, error=str(e))
+        raise
+    await queue.update_stage(job_id, name, STAGE_DONE)
+
+def current_job_id() -> Optional[str]:
+    """Id of the job being processed by the current task, if there is one."""
+    current = _current_job.get()
+    return current[1] if current is not None else None
+
+async def job_progress(stage: str, progress: float):
+    """Record how far along a stage of the current job is, if there is one."""
+    current = _current_job.get()
+    if current is not None:
+        queue, job_id = current
+        await queue.set_stage_progress(job_id, stage, round(progress, 3))
+
+class JobWorker:
+    """Pulls jobs from a queue and runs them with bounded concurrency.
+
+    A handler result containing "error" counts as a failed attempt. Failed
+    attempts are retried with jittered exponential backoff until the job runs
+    out of attempts, except permanent failures (a PermanentJobError, or a
+    result with "retryable": False), which fail the job at once.
+    """
+
+    def __init__(
+        self,
+        queue: Any,
+        handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        concurrency: int = 2,
+        lease_seconds: float = 120,
+        poll_interval: float = 1.0,
+        retry_backoff: float = 10,
+        max_backoff: float = 600
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.worker_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.logger = logging.getLogger("JobWorker")
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Start the worker loops."""
+        self._tasks = [
+            asyncio.create_task(self._run_loop(index))
+            for index in range(self.concurrency)
+        ]
+        self.logger.info(f"Started {self.concurrency} job workers as {self.worker_id}")
+
+    async def stop(self):
+        """Stop the worker loops; interrupted jobs are reclaimed once their lease expires."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run_loop(self, index: int):
+        while True:
+            try:
+                job = await self.queue.claim(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                self.logger.error(f"Error claiming job: {str(e)}")
+                job = None
+
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            await self._process(job)
+
+    async def _process(self, job: Dict[str, Any]):
+        job_id = job["_id"]
+        if job["attempts"] > job["max_attempts"]:
+            await self.queue.fail(job_id, job.get("error") or "Exceeded max attempts")
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        token = _current_job.set((self.queue, job_id))
+        # Log lines for the job carry the trace of the request that queued it
+        trace_token = trace_id.set(job["payload"].get("trace_id") or job_id)
+        try:
+            result = await self.handler(job["payload"])
+            if result.get("error"):
+                if result.get("retryable") is False:
+                    raise PermanentJobError(result["error"])
+                raise RuntimeError(result["error"])
+            await self.queue.complete(job_id, result)
+        except PermanentJobError as e:
+            self.logger.error(f"Job {job_id} failed permanently: {str(e)}")
+            await self.queue.fail(job_id, str(e))
+        except Exception as e:
+            await self._retry_or_fail(job, str(e))
+        finally:
+            trace_id.reset(trace_token)
+            _current_job.reset(token)
+            heartbeat.cancel()
+
+    async def _retry_or_fail(self, job: Dict[str, Any], error: str):
+        if job["attempts"] >= job["max_attempts"]:
+            self.logger.error(f"Job {job['_id']} failed after {job['attempts']} attempts: {error}")
+            await self.queue.fail(job["_id"], error)
+            return
+
+        delay = min(self.max_backoff, self.retry_backoff * 2 ** (job["attempts"] - 1))
+        delay *= random.uniform(0.5, 1.0)
+        self.logger.warning(f"Job {job['_id']} attempt {job['attempts']} failed, retrying in {delay:.0f}s: {error}")
+        await self.queue.fail(job["_id"], error, retry_at=datetime.utcnow() + timedelta(seconds=delay))
+
+    async def _heartbeat(self, job_id: str):
+        """Keep the lease alive while a long job is running."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.queue.extend_lease(job_id, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                self.logger.error(f"Error extending lease for job {job_id}: {str(e)}")
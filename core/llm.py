@@ -0,0 +1,251 @@
+# core/llm.py
+
+import asyncio
+import logging
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+import openai
+
+from core.llm_cache import LLMResponseCache
+from core.rate_limit import TokenBucket
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class LLMGateway:
+    """Shared async OpenAI client for all agents.
+
+    Keeps one pooled keep-alive HTTP client and paces calls with token
+    buckets sized to the account's requests-per-minute and tokens-per-minute
+    quotas. 429s, 5xx responses and connection errors are retried with
+    jittered backoff. Optionally answers repeat calls from a response cache.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        default_model: str = "gpt-3.5-turbo",
+        requests_per_minute: int = 3500,
+        tokens_per_minute: int = 90000,
+        max_retries: int = 5,
+        max_connections: int = 50,
+        timeout: float = 60,
+        cache: Optional[LLMResponseCache] = None,
+        base_url: Optional[str] = None
+    ):
+        self.default_model = default_model
+        self.max_retries = max_retries
+        self.cache = cache
+        self.logger = logging.getLogger("LLMGateway")
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            timeout=timeout
+        )
+        # Retries are handled here so they also respect the rate limiter
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self.http_client,
+            max_retries=0
+        )
+        self.request_bucket = TokenBucket(requests_per_minute / 60, max(1, requests_per_minute / 60))
+        self.token_bucket = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 6)
+        self.stats = {
+            "requests": 0,
+            "streams": 0,
+            "retries": 0,
+            "errors": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "latency_seconds_total": 0.0,
+            "latency_seconds_max": 0.0
+        }
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        validate: Optional[Callable[[str], Any]] = None,
+        **params
+    ) -> str:
+        """Return the completion text for messages, served from cache when possible.
+
+        context identifies the request for caching beyond the messages
+        themselves, e.g. the tour id and normalized customization needs.
+        validate, when given, raises ValueError for unusable completions;
+        those are raised to the caller and never cached.
+        """
+        model = model or self.default_model
+        if self.cache is None:
+            content = await self._complete(model, messages, params)
+            if validate:
+                validate(content)
+            return content
+        return await self.cache.get_or_create(
+            model,
+            messages,
+            lambda: self._complete(model, messages, params),
+            context={**(context or {}), "params": params},
+            validate=validate
+        )
+
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        validate: Optional[Callable[[str], Any]] = None,
+        **params
+    ) -> AsyncIterator[str]:
+        """Yield completion text as it is generated.
+
+        A cached completion is yielded in one piece; a fresh one is cached
+        once the stream finishes, if validate (when given) accepts it.
+        """
+        model = model or self.default_model
+        cache_context = {**(context or {}), "params": params}
+        if self.cache is not None:
+            cached = await self.cache.get(model, messages, cache_context)
+            if cached is not None and self._accepts(validate, cached):
+                yield cached
+                return
+            if cached is not None:
+                await self.cache.invalidate(model, messages, cache_context)
+
+        estimated_tokens = self._estimate_tokens(messages, params.get("max_tokens"))
+        await self.request_bucket.acquire()
+        await self.token_bucket.acquire(estimated_tokens)
+
+        started = time.monotonic()
+        # Ask for a final usage chunk; this client version has no stream_options
+        # argument, so it goes in the request body directly
+        stream = await self._with_retries(lambda: self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            extra_body={"stream_options": {"include_usage": True}},
+            **params
+        ))
+
+        chunks = []
+        first_token_latency = None
+        usage = None
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token_latency is None:
+                    first_token_latency = time.monotonic() - started
+                chunks.append(delta)
+                yield delta
+
+        content = "".join(chunks)
+        latency = time.monotonic() - started
+        self.stats["streams"] += 1
+        self._record(model, usage, latency, estimated_tokens)
+        self.logger.debug(f"OpenAI stream {model} first token after {first_token_latency or 0:.2f}s")
+        if self.cache is not None and self._accepts(validate, content):
+            await self.cache.set(model, messages, content, cache_context)
+
+    @staticmethod
+    def _accepts(validate: Optional[Callable[[str], Any]], content: str) -> bool:
+        if validate is None:
+            return True
+        try:
+            validate(content)
+            return True
+        except ValueError:
+            return False
+
+    async def _with_retries(self, call):
+        """Await call(), retrying transient failures with backoff."""
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except (openai.APIConnectionError, openai.APIStatusError) as e:
+                attempt += 1
+                if not self._is_retryable(e) or attempt > self.max_retries:
+                    self.stats["errors"] += 1
+                    self.logger.error(f"OpenAI call failed after {attempt} attempts: {str(e)}")
+                    raise
+                delay = self._retry_delay(e, attempt)
+                self.stats["retries"] += 1
+                self.logger.warning(f"OpenAI call failed ({str(e)}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                await self.request_bucket.acquire()
+
+    async def _complete(self, model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+        estimated_tokens = self._estimate_tokens(messages, params.get("max_tokens"))
+        await self.request_bucket.acquire()
+        await self.token_bucket.acquire(estimated_tokens)
+
+        started = time.monotonic()
+        response = await self._with_retries(lambda: self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            **params
+        ))
+
+        latency = time.monotonic() - started
+        self._record(response.model, response.usage, latency, estimated_tokens)
+        return response.choices[0].message.content
+
+    def _record(self, model: str, usage: Any, latency: float, estimated_tokens: int):
+        """Count a finished call and settle its token estimate against usage.
+
+        usage is the response's usage object, or the plain dict a streamed
+        usage chunk carries; None when the API reported none.
+        """
+        self.stats["requests"] += 1
+        self.stats["latency_seconds_total"] += latency
+        self.stats["latency_seconds_max"] = max(self.stats["latency_seconds_max"], latency)
+        if isinstance(usage, dict):
+            usage = SimpleNamespace(**usage)
+        if usage:
+            self.stats["prompt_tokens"] += usage.prompt_tokens
+            self.stats["completion_tokens"] += usage.completion_tokens
+            # Settle the estimate against what was actually used
+            self.token_bucket.adjust(estimated_tokens - usage.total_tokens)
+        self.logger.debug(
+            f"OpenAI {model} {latency:.2f}s "
+            f"tokens={usage.total_tokens if usage else 'n/a'}"
+        )
+
+    @staticmethod
+    def _estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int]) -> int:
+        """Rough pre-call token estimate (about four characters per token)."""
+        prompt = sum(len(message.get("content") or "") for message in messages) // 4
+        return prompt + 4 * len(messages) + (max_tokens or 256)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return True
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        """Honour Retry-After when given, else jittered exponential backoff."""
+        if isinstance(error, openai.APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                return float(retry_after) + random.uniform(0, 0.5)
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+
+    async def close(self):
+        await self.http_client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
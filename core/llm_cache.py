@@ -0,0 +1,113 @@
+# core/llm_cache.py
+
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core.cache import MISSING, ReadThroughCache
+
+def normalize_customization(value: Any) -> Any:
+    """Normalize a customization payload so equivalent requests compare equal.
+
+    Keys are sorted and lower-cased, and strings are case-folded with
+    whitespace collapsed, so "Beach  Days" and "beach days" share a cache entry.
+    """
+    if isinstance(value, dict):
+        return {
+            str(key).strip().casefold(): normalize_customization(item)
+            for key, item in sorted(value.items(), key=lambda kv: str(kv[0]).strip().casefold())
+        }
+    if isinstance(value, (list, tuple)):
+        return [normalize_customization(item) for item in value]
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    return value
+
+class LLMResponseCache:
+    """Caches chat completion text keyed by model, messages and request context."""
+
+    def __init__(self, cache: ReadThroughCache):
+        self.cache = cache
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Build a deterministic key for a completion request."""
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "context": normalize_customization(context or {})
+            },
+            sort_keys=True,
+            default=str
+        )
+        return f"llm:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    async def get_or_create(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        create: Callable[[], Awaitable[str]],
+        context: Optional[Dict[str, Any]] = None,
+        validate: Optional[Callable[[str], Any]] = None
+    ) -> str:
+        """Return the cached completion, calling create on a miss.
+
+        With validate, only completions it accepts are cached; it signals
+        rejection by raising ValueError. A cached completion it rejects is
+        dropped and created afresh.
+        """
+        key = self.make_key(model, messages, context)
+        if validate is None:
+            return await self.cache.get_or_load(key, create)
+
+        value = await self.cache.get(key)
+        if value is not MISSING:
+            try:
+                validate(value)
+                return value
+            except ValueError:
+                await self.cache.invalidate(key)
+
+        self.cache.stats["misses"] += 1
+        value = await create()
+        validate(value)
+        await self.cache.set(key, value)
+        return value
+
+    async def get(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """Return the cached completion, or None on a miss."""
+        value = await self.cache.get(self.make_key(model, messages, context))
+        if value is MISSING:
+            self.cache.stats["misses"] += 1
+            return None
+        return value
+
+    async def invalidate(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]] = None
+    ):
+        await self.cache.invalidate(self.make_key(model, messages, context))
+
+    async def set(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        content: str,
+        context: Optional[Dict[str, Any]] = None
+    ):
+        await self.cache.set(self.make_key(model, messages, context), content)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.cache.get_stats()
@@ -0,0 +1,230 @@
+# core/logging_setup.py
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from core.metrics import TraceIdFilter
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s]    %(message)s"
+
+# Keys whose values never reach the log, matched case-insensitively as substrings
+DEFAULT_REDACT_KEYS = ("token", "secret", "password", "api_key", "authorization", "cookie")
+
+# LogRecord attributes that are not user-supplied extra fields
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "trace_id", "activity", "dropped"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def redact(value: Any, keys: Iterable[str], max_chars: int, depth: int = 0) -> Any:
+    """Copy of value with secrets masked and long strings and containers cut short."""
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else f"{value[:max_chars]}…[{len(value) - max_chars} more chars]"
+    if depth >= 4:
+        return value if isinstance(value, (int, float, bool, type(None))) else "…"
+    if isinstance(value, dict):
+        items = list(value.items())
+        copied = {
+            key: "[redacted]" if any(secret in str(key).lower() for secret in keys)
+            else redact(item, keys, max_chars, depth + 1)
+            for key, item in items[:50]
+        }
+        if len(items) > 50:
+            copied["…"] = f"{len(items) - 50} more keys"
+        return copied
+    if isinstance(value, (list, tuple)):
+        copied = [redact(item, keys, max_chars, depth + 1) for item in value[:50]]
+        if len(value) > 50:
+            copied.append(f"…{len(value) - 50} more items")
+        return copied
+    return value
+
+def _redact_args(args: Any, keys: Iterable[str], max_chars: int) -> Any:
+    """redact() for LogRecord.args, which must stay a tuple or a mapping."""
+    if isinstance(args, tuple):
+        return tuple(redact(list(args), keys, max_chars))
+    return redact(args, keys, max_chars)
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of debug records and agent activity records.
+
+    rates maps "debug" and "activity" to the fraction kept. The decision is
+    made per trace id, so a sampled request keeps all of its lines. Warnings
+    and errors are never dropped.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno == logging.DEBUG:
+            rate = self.rates.get("debug", 1.0)
+        elif getattr(record, "activity", False) and record.levelno <= logging.INFO:
+            rate = self.rates.get("activity", 1.0)
+        else:
+            return True
+        if rate >= 1:
+            return True
+        trace = getattr(record, "trace_id", "-")
+        if trace == "-":
+            return random.random() < rate
+        return zlib.crc32(trace.encode("utf-8")) % 10000 < rate * 10000
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a bounded queue without formatting them.
+
+    The stock QueueHandler formats every record in the caller's thread;
+    here only the arguments are snapshotted, and the writer thread
+    formats. When the queue is full the record is dropped rather than
+    blocking the event loop, and the next record carries the drop count.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Containers are copied so later changes by the caller cannot race the writer
+        if isinstance(record.args, dict):
+            record.args = dict(record.args)
+        elif record.args:
+            record.args = tuple(
+                dict(arg) if isinstance(arg, dict) else list(arg) if isinstance(arg, list) else arg
+                for arg in record.args
+            )
+        if self.dropped:
+            record.dropped, self.dropped = self.dropped, 0
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """QueueListener that waits for room for its stop sentinel.
+
+    The stock listener puts the sentinel with put_nowait, which raises
+    queue.Full when stop() is called with a full queue. Blocking here is
+    safe because the listener thread keeps draining until it sees the
+    sentinel, so everything already queued is written first.
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with redacted and truncated arguments.
+
+    Extra fields passed to the logger are included as keys.
+    """
+
+    def __init__(self, redact_keys: Iterable[str] = DEFAULT_REDACT_KEYS, max_chars: int = 2000):
+        super().__init__()
+        self.redact_keys = tuple(key.lower() for key in redact_keys)
+        self.max_chars = max_chars
+
+    def _message(self, record: logging.LogRecord) -> str:
+        if record.args:
+            record.args = _redact_args(record.args, self.redact_keys, self.max_chars)
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            message = f"{message[:self.max_chars]}…[{len(message) - self.max_chars} more chars]"
+        return message
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "message": self._message(record)
+        }
+        if getattr(record, "dropped", 0):
+            entry["dropped_before"] = record.dropped
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = redact(value, self.redact_keys, self.max_chars)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TruncatingFormatter(logging.Formatter):
+    """The classic text format, with the same redaction and truncation as JSON."""
+
+    def __init__(self, fmt: str, redact_keys: Iterable[str] = DEFAULT_REDACT_KEYS, max_chars: int = 2000):
+        super().__init__(fmt)
+        self.redact_keys = tuple(key.lower() for key in redact_keys)
+        self.max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        if record.args:
+            record.args = _redact_args(record.args, self.redact_keys, self.max_chars)
+        return super().format(record)
+
+def configure_logging(
+    filename: str = "logs/fursat_ai.log",
+    level: str = "INFO",
+    log_format: str = "json",
+    max_bytes: int = 50 * 1024 * 1024,
+    backup_count: int = 5,
+    queue_size: int = 10000,
+    max_chars: int = 2000,
+    sample_rates: Optional[Dict[str, float]] = None,
+    redact_keys: Iterable[str] = DEFAULT_REDACT_KEYS
+):
+    """Send root logging through a queue to a size-rotated file.
+
+    Callers only filter, sample and enqueue; a listener thread formats
+    records and does all the disk I/O. The thread starts here, so call this
+    on startup (the app lifespan or the worker), not at import, and pair it
+    with shutdown_logging(). Calling again replaces the previous setup.
+    """
+    global _listener
+
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        filename,
+        maxBytes=max_bytes,
+        backupCount=backup_count,
+        encoding="utf-8"
+    )
+    if log_format == "json":
+        file_handler.setFormatter(JsonFormatter(redact_keys, max_chars))
+    else:
+        file_handler.setFormatter(TruncatingFormatter(TEXT_FORMAT, redact_keys, max_chars))
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    # The trace id is a contextvar, so it is read before the record changes thread
+    queue_handler.addFilter(TraceIdFilter())
+    queue_handler.addFilter(SamplingFilter(sample_rates or {}))
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = DrainingQueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+def shutdown_logging():
+    """Write out queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(shutdown_logging)
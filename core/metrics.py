@@ -0,0 +1,139 @@
+# core/metrics.py
+
+import contextvars
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from prometheus_client import REGISTRY, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Spans milliseconds (cache hits) to tens of minutes (renders)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+AGENT_STAGE_SECONDS = Histogram(
+    "fursat_agent_stage_seconds",
+    "Time spent in each agent stage",
+    ["agent", "stage", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+ROUTE_SECONDS = Histogram(
+    "fursat_route_seconds",
+    "Time for AgentRouter.route_message, including queueing",
+    ["message_type", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "fursat_http_request_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+JOB_QUEUE_PENDING = Gauge(
+    "fursat_job_queue_pending",
+    "Content jobs waiting for a worker"
+)
+
+# Trace id of the request or job being handled, carried into log records
+trace_id: contextvars.ContextVar = contextvars.ContextVar("trace_id", default="-")
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+class TraceIdFilter(logging.Filter):
+    """Adds the current trace id to log records as %(trace_id)s."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id.get()
+        return True
+
+@contextmanager
+def observe_stage(agent: str, stage: str) -> Iterator[None]:
+    """Record how long a stage of an agent took and whether it raised."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        AGENT_STAGE_SECONDS.labels(agent, stage, outcome).observe(time.perf_counter() - started)
+
+def response_outcome(response: Any) -> str:
+    """Label an agent response: success, error, or the capacity status it carries."""
+    if not isinstance(response, dict) or "error" not in response:
+        return "success"
+    return response.get("status") or "error"
+
+class ServiceStatsCollector:
+    """Exports the counters the services already keep, read at scrape time.
+
+    Bound to a Services instance once it is built; before that it exports
+    nothing.
+    """
+
+    def __init__(self):
+        self.services: Optional[Any] = None
+
+    def bind(self, services: Any):
+        self.services = services
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        services = self.services
+        if services is None or not services.built:
+            return
+
+        in_flight = GaugeMetricFamily("fursat_agent_in_flight", "Calls running per agent", labels=["agent"])
+        queued = GaugeMetricFamily("fursat_agent_queued", "Calls waiting for a slot per agent", labels=["agent"])
+        for message_type, limiter in services.router.limiters.items():
+            in_flight.add_metric([message_type], limiter.in_flight)
+            queued.add_metric([message_type], limiter.queued)
+        yield in_flight
+        yield queued
+
+        coalesced = CounterMetricFamily("fursat_route_coalesced", "Router calls that shared an in-flight execution")
+        coalesced.add_metric([], services.router.flights.stats["coalesced"])
+        yield coalesced
+
+        hits = CounterMetricFamily("fursat_cache_hits", "Cache hits by tier", labels=["cache", "tier"])
+        misses = CounterMetricFamily("fursat_cache_misses", "Cache misses", labels=["cache"])
+        for name, cache in (("tours", services.tour_cache), ("llm", services.llm_cache)):
+            stats = cache.get_stats()
+            hits.add_metric([name, "local"], stats["local_hits"])
+            hits.add_metric([name, "remote"], stats["remote_hits"])
+            misses.add_metric([name], stats["misses"])
+        yield hits
+        yield misses
+
+        openai_stats = services.llm.get_stats()
+        requests = CounterMetricFamily("fursat_openai_requests", "OpenAI calls by result", labels=["result"])
+        requests.add_metric(["completed"], openai_stats["requests"])
+        requests.add_metric(["retried"], openai_stats["retries"])
+        requests.add_metric(["failed"], openai_stats["errors"])
+        yield requests
+        tokens = CounterMetricFamily("fursat_openai_tokens", "OpenAI tokens used", labels=["kind"])
+        tokens.add_metric(["prompt"], openai_stats["prompt_tokens"])
+        tokens.add_metric(["completion"], openai_stats["completion_tokens"])
+        yield tokens
+
+        renders = GaugeMetricFamily("fursat_render_jobs", "Render jobs by state", labels=["state"])
+        renders.add_metric(["running"], services.render_executor.running)
+        renders.add_metric(["waiting"], services.render_executor.waiting)
+        yield renders
+
+        deliveries = CounterMetricFamily("fursat_webhook_deliveries", "Webhook deliveries by outcome", labels=["webhook", "outcome"])
+        pending = GaugeMetricFamily("fursat_webhook_pending", "Webhook deliveries being processed", labels=["webhook"])
+        for dispatcher in (services.telegram_webhooks, services.whatsapp_webhooks):
+            stats = dispatcher.get_stats()
+            for outcome in ("accepted", "duplicates", "rejected", "completed", "errors"):
+                deliveries.add_metric([dispatcher.name, outcome], stats[outcome])
+            pending.add_metric([dispatcher.name], stats["pending"])
+        yield deliveries
+        yield pending
+
+stats_collector = ServiceStatsCollector()
+REGISTRY.register(stats_collector)
@@ -0,0 +1,67 @@
+# core/prompts.py
+
+import json
+from functools import lru_cache
+from typing import Any, Callable, Dict, List
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; counts fall back to an estimate
+    tiktoken = None
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """Tokens in text for model; about four characters per token without tiktoken."""
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    return len(_encoding(model).encode(text))
+
+def compact_json(value: Any) -> str:
+    """JSON without optional whitespace, which costs tokens and carries nothing."""
+    return json.dumps(value, separators=(",", ":"), sort_keys=True, default=str, ensure_ascii=False)
+
+def _truncate_strings(value: Any, max_chars: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars].rstrip() + "…"
+    if isinstance(value, dict):
+        return {key: _truncate_strings(item, max_chars) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_truncate_strings(item, max_chars) for item in value]
+    return value
+
+def fit_to_budget(
+    payload: Dict[str, Any],
+    budget: int,
+    count: Callable[[str], int],
+    list_fields: List[str],
+    min_chars: int = 40
+) -> Dict[str, Any]:
+    """Shrink payload until its compact JSON fits in budget tokens.
+
+    Very long strings are capped first, then lists in list_fields are cut,
+    keeping their head and noting how many items were left out, and finally
+    strings are truncated further.
+    """
+    if count(compact_json(payload)) <= budget:
+        return payload
+    max_chars = 400
+    payload = _truncate_strings(payload, max_chars)
+
+    originals = {field: list(payload.get(field) or []) for field in list_fields}
+    keep = {field: len(items) for field, items in originals.items()}
+    while count(compact_json(payload)) > budget and any(size > 1 for size in keep.values()):
+        field = max(keep, key=keep.get)
+        keep[field] = max(1, keep[field] // 2)
+        items = originals[field]
+        payload[field] = items[:keep[field]] + [f"…and {len(items) - keep[field]} more"]
+
+    while count(compact_json(payload)) > budget and max_chars > min_chars:
+        max_chars //= 2
+        payload = _truncate_strings(payload, max_chars)
+    return payload
@@ -0,0 +1,598 @@
+# core/publishing.py
+
+import asyncio
+import copy
+import hashlib
+import heapq
+import json
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+POST_SCHEDULED = "scheduled"
+POST_PUBLISHING = "publishing"
+POST_PUBLISHED = "published"
+POST_FAILED = "failed"
+
+def utc_naive(value: Optional[datetime]) -> datetime:
+    """value as a naive UTC datetime, the form MongoDB hands back; now if None."""
+    if value is None:
+        return datetime.utcnow()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+def _new_post(
+    platform: str,
+    video_path: str,
+    caption: str,
+    publish_at: datetime,
+    max_attempts: int,
+    metadata: Optional[Dict[str, Any]] = None,
+    key: Optional[str] = None
+) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        # A keyed post always gets the same id, so scheduling it twice is a no-op
+        "_id": hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] if key else uuid.uuid4().hex,
+        "platform": platform,
+        "video_path": video_path,
+        "caption": caption,
+        "metadata": metadata or {},
+        "publish_at": publish_at,
+        "status": POST_SCHEDULED,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "claimed_by": None,
+        "lease_expires_at": None,
+        "posted_at": None,
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+class MongoPostBacklog:
+    """Scheduled posts stored in MongoDB.
+
+    Posts are claimed in batches with a lease, so several scheduler processes
+    can share one backlog and a post whose process died is picked up again
+    once its lease expires.
+    """
+
+    def __init__(self, database: Any, collection_name: str = "scheduled_posts"):
+        self.database = database
+        self.collection_name = collection_name
+
+    @property
+    def collection(self):
+        return self.database.collection(self.collection_name)
+
+    @property
+    def limits(self):
+        # Rate limit slots per platform
+        return self.database.collection(f"{self.collection_name}_limits")
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("status", 1), ("publish_at", 1)])
+        await self.collection.create_index([("status", 1), ("lease_expires_at", 1)])
+
+    async def add(self, post: Dict[str, Any]) -> bool:
+        """Insert post; False if a post with its id already exists."""
+        try:
+            await self.collection.insert_one(post)
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def pending(self) -> List[Dict[str, Any]]:
+        """Id, platform and publish_at of every post waiting to be published."""
+        now = datetime.utcnow()
+        cursor = self.collection.find(
+            {"$or": [
+                {"status": POST_SCHEDULED},
+                {"status": POST_PUBLISHING, "lease_expires_at": {"$lte": now}}
+            ]},
+            {"platform": 1, "publish_at": 1}
+        )
+        return await cursor.to_list(length=None)
+
+    async def claim(self, post_ids: List[str], owner: str, lease_seconds: float) -> List[Dict[str, Any]]:
+        """Take the given posts that are still waiting; others are skipped."""
+        now = datetime.utcnow()
+        token = f"{owner}:{uuid.uuid4().hex}"
+        await self.collection.update_many(
+            {
+                "_id": {"$in": post_ids},
+                "$or": [
+                    {"status": POST_SCHEDULED},
+                    {"status": POST_PUBLISHING, "lease_expires_at": {"$lte": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": POST_PUBLISHING,
+                    "claimed_by": token,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "posted_at": now,
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            }
+        )
+        cursor = self.collection.find({"_id": {"$in": post_ids}, "claimed_by": token})
+        return await cursor.to_list(length=None)
+
+    async def reserve(
+        self,
+        platform: str,
+        post_ids: List[str],
+        calls: int,
+        period: float,
+        attempt: str
+    ) -> Tuple[List[str], Optional[datetime]]:
+        """Take rate limit slots on platform for as many of post_ids as fit.
+
+        Slots live in one document per platform, updated only if its
+        version is unchanged since it was read, so schedulers in several
+        processes cannot hand out the same slot. Each slot is tagged with
+        attempt, so release() frees only this attempt's slots. Returns the
+        ids that got a slot and, when some did not, when the next slot frees.
+        """
+        now = datetime.utcnow()
+        await self.limits.update_one(
+            {"_id": platform},
+            {"$pull": {"sent": {"at": {"$lt": now - timedelta(seconds=period)}}}},
+            upsert=True
+        )
+        while True:
+            window = await self.limits.find_one({"_id": platform}) or {}
+            sent = window.get("sent", [])
+            taken = post_ids[:max(0, calls - len(sent))]
+            if taken:
+                result = await self.limits.update_one(
+                    {"_id": platform, "version": window.get("version")},
+                    {
+                        "$push": {"sent": {"$each": [
+                            {"post_id": post_id, "attempt": attempt, "at": now} for post_id in taken
+                        ]}},
+                        "$inc": {"version": 1}
+                    }
+                )
+                if not result.modified_count:
+                    continue
+            if len(taken) == len(post_ids):
+                return taken, None
+            oldest = sent[0]["at"] if sent else now
+            return taken, oldest + timedelta(seconds=period)
+
+    async def release(self, platform: str, post_ids: List[str], attempt: str):
+        """Give back the slots attempt took for posts that were not sent after all.
+
+        Slots another attempt holds for the same posts, such as one that
+        did publish them, are kept.
+        """
+        await self.limits.update_one(
+            {"_id": platform},
+            {
+                "$pull": {"sent": {"post_id": {"$in": post_ids}, "attempt": attempt}},
+                "$inc": {"version": 1}
+            }
+        )
+
+    async def complete(self, post_id: str, result: Dict[str, Any]):
+        await self.collection.update_one(
+            {"_id": post_id},
+            {"$set": {
+                "status": POST_PUBLISHED,
+                "result": result,
+                "error": None,
+                "lease_expires_at": None,
+                "updated_at": datetime.utcnow()
+            }}
+        )
+
+    async def fail(self, post_id: str, error: str, retry_at: Optional[datetime] = None):
+        """Record a failed attempt, rescheduling the post if retry_at is given."""
+        changes = {
+            "status": POST_SCHEDULED if retry_at else POST_FAILED,
+            "error": error,
+            "lease_expires_at": None,
+            "posted_at": None,
+            "updated_at": datetime.utcnow()
+        }
+        if retry_at:
+            changes["publish_at"] = retry_at
+        await self.collection.update_one({"_id": post_id}, {"$set": changes})
+
+    async def get(self, post_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": post_id})
+
+class InMemoryPostBacklog:
+    """Process-local stand-in for MongoPostBacklog, for development and tests."""
+
+    def __init__(self):
+        self._posts: Dict[str, Dict[str, Any]] = {}
+        # Per platform: (post id, sent at, attempt)
+        self._sent: Dict[str, List[Tuple[str, datetime, str]]] = {}
+
+    async def ensure_indexes(self):
+        pass
+
+    async def add(self, post: Dict[str, Any]) -> bool:
+        if post["_id"] in self._posts:
+            return False
+        self._posts[post["_id"]] = post
+        return True
+
+    def _waiting(self, post: Dict[str, Any], now: datetime) -> bool:
+        return post["status"] == POST_SCHEDULED or (
+            post["status"] == POST_PUBLISHING and post["lease_expires_at"] <= now
+        )
+
+    async def pending(self) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return [
+            {"_id": post["_id"], "platform": post["platform"], "publish_at": post["publish_at"]}
+            for post in self._posts.values() if self._waiting(post, now)
+        ]
+
+    async def claim(self, post_ids: List[str], owner: str, lease_seconds: float) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        claimed = []
+        for post_id in post_ids:
+            post = self._posts.get(post_id)
+            if post is None or not self._waiting(post, now):
+                continue
+            post.update({
+                "status": POST_PUBLISHING,
+                "claimed_by": owner,
+                "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                "posted_at": now,
+                "updated_at": now
+            })
+            post["attempts"] += 1
+            claimed.append(copy.deepcopy(post))
+        return claimed
+
+    async def reserve(
+        self,
+        platform: str,
+        post_ids: List[str],
+        calls: int,
+        period: float,
+        attempt: str
+    ) -> Tuple[List[str], Optional[datetime]]:
+        # No awaits, so reservations cannot interleave within the process
+        now = datetime.utcnow()
+        since = now - timedelta(seconds=period)
+        sent = [entry for entry in self._sent.get(platform, []) if entry[1] >= since]
+        taken = post_ids[:max(0, calls - len(sent))]
+        self._sent[platform] = sent + [(post_id, now, attempt) for post_id in taken]
+        if len(taken) == len(post_ids):
+            return taken, None
+        oldest = sent[0][1] if sent else now
+        return taken, oldest + timedelta(seconds=period)
+
+    async def release(self, platform: str, post_ids: List[str], attempt: str):
+        released = set(post_ids)
+        self._sent[platform] = [
+            entry for entry in self._sent.get(platform, [])
+            if entry[0] not in released or entry[2] != attempt
+        ]
+
+    async def complete(self, post_id: str, result: Dict[str, Any]):
+        self._posts[post_id].update({
+            "status": POST_PUBLISHED,
+            "result": result,
+            "error": None,
+            "lease_expires_at": None,
+            "updated_at": datetime.utcnow()
+        })
+
+    async def fail(self, post_id: str, error: str, retry_at: Optional[datetime] = None):
+        post = self._posts[post_id]
+        post.update({
+            "status": POST_SCHEDULED if retry_at else POST_FAILED,
+            "error": error,
+            "lease_expires_at": None,
+            "posted_at": None,
+            "updated_at": datetime.utcnow()
+        })
+        if retry_at:
+            post["publish_at"] = retry_at
+
+    async def get(self, post_id: str) -> Optional[Dict[str, Any]]:
+        post = self._posts.get(post_id)
+        return copy.deepcopy(post) if post else None
+
+class LocalPublisher:
+    """Stand-in publisher that links posts into a local directory.
+
+    Each platform gets a subdirectory holding the published videos and a
+    posts.jsonl manifest, so tests and development runs can check what
+    would have gone out.
+    """
+
+    def __init__(self, directory: str = "published"):
+        self.directory = directory
+
+    async def publish_batch(self, platform: str, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._publish, platform, posts)
+
+    def _publish(self, platform: str, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        target_dir = os.path.join(self.directory, platform)
+        os.makedirs(target_dir, exist_ok=True)
+        results = []
+        with open(os.path.join(target_dir, "posts.jsonl"), "a") as manifest:
+            for post in posts:
+                if not os.path.exists(post["video_path"]):
+                    results.append({"error": f"Video not found: {post['video_path']}"})
+                    continue
+                target = os.path.join(target_dir, f"{post['_id']}.mp4")
+                if not os.path.exists(target):
+                    os.link(post["video_path"], target)
+                manifest.write(json.dumps({
+                    "post_id": post["_id"],
+                    "caption": post["caption"],
+                    "path": target,
+                    "published_at": datetime.utcnow().isoformat()
+                }) + "\n")
+                results.append({"url": f"file://{os.path.abspath(target)}"})
+        return results
+
+class PublishScheduler:
+    """Publishes scheduled posts when they fall due.
+
+    The backlog is the source of truth; a heap of (publish_at, post id,
+    platform) held in memory decides what to do next, and one timer task
+    sleeps until its head is due or an earlier post arrives. start() rebuilds
+    the heap from the backlog, so posts survive restarts, and the backlog is
+    re-read every resync_interval to pick up posts scheduled by other
+    processes or left behind by one that died.
+
+    Posts falling due within batch_window of each other go to their
+    platform's publisher together, at most max_batch at a time. rate_limits
+    maps a platform to {"calls", "period"}; each post reserves a slot in the
+    backlog before it is claimed, and posts beyond a platform's limit over
+    the trailing period wait until a slot frees. Reservations and claims are
+    atomic in MongoDB, so concurrent batches and schedulers in several
+    processes (the API and worker.py) share one limit. Failed posts are
+    retried with jittered exponential backoff until they run out of attempts.
+
+    With a media_store, each post holds its video there from scheduling
+    until it is published or given up on, so the disk budget cannot evict
+    a video still waiting in the backlog.
+    """
+
+    def __init__(
+        self,
+        backlog: Any,
+        publishers: Dict[str, Any],
+        rate_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        batch_window: float = 1.0,
+        max_batch: int = 20,
+        max_attempts: int = 3,
+        lease_seconds: float = 300,
+        retry_backoff: float = 60,
+        max_backoff: float = 3600,
+        resync_interval: float = 30,
+        media_store: Optional[Any] = None
+    ):
+        self.backlog = backlog
+        self.publishers = publishers
+        self.rate_limits = rate_limits or {}
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.resync_interval = resync_interval
+        self.media_store = media_store
+        self.owner = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.logger = logging.getLogger("PublishScheduler")
+        self._heap: List[Tuple[float, str, str]] = []
+        self._queued: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._loops: List[asyncio.Task] = []
+        self._batches: Set[asyncio.Task] = set()
+        self.stats = {
+            "scheduled": 0,
+            "published": 0,
+            "retried": 0,
+            "failed": 0,
+            "rate_limited": 0,
+            "batches": 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._loops)
+
+    async def schedule(
+        self,
+        platform: str,
+        video_path: str,
+        caption: str,
+        publish_at: Optional[datetime] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Add a post to the backlog, to publish at publish_at (now if None).
+
+        Posts scheduled with the same key are the same post: only the first
+        call adds it, and later calls return it as it stands.
+        """
+        if platform not in self.publishers:
+            raise ValueError(f"No publisher for platform {platform!r}")
+        post = _new_post(platform, video_path, caption, utc_naive(publish_at), self.max_attempts, metadata, key)
+        # Held before it is added, so the video cannot be evicted in between
+        if self.media_store is not None:
+            self.media_store.hold(video_path, post["_id"])
+        if not await self.backlog.add(post):
+            post = await self.backlog.get(post["_id"])
+            if post["status"] in (POST_PUBLISHED, POST_FAILED):
+                self._release_video(post)
+            return {"post_id": post["_id"], "platform": post["platform"], "publish_at": post["publish_at"]}
+        self.stats["scheduled"] += 1
+        if self.running:
+            self._push(post)
+        return {"post_id": post["_id"], "platform": platform, "publish_at": post["publish_at"]}
+
+    async def start(self):
+        """Load the backlog and start the timer and resync loops."""
+        await self.backlog.ensure_indexes()
+        await self._resync()
+        self._loops = [
+            asyncio.create_task(self._run_loop()),
+            asyncio.create_task(self._resync_loop())
+        ]
+        self.logger.info(f"Publish scheduler started as {self.owner} with {len(self._heap)} posts pending")
+
+    async def stop(self, timeout: float = 30):
+        """Stop scheduling and wait for batches being published.
+
+        Batches still running at timeout are cancelled; their posts are
+        published again once their lease expires.
+        """
+        for task in self._loops:
+            task.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops = []
+        if self._batches:
+            _, still_running = await asyncio.wait(set(self._batches), timeout=timeout)
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*still_running, return_exceptions=True)
+        self._heap = []
+        self._queued.clear()
+
+    def _push(self, post: Dict[str, Any], at: Optional[float] = None):
+        if post["_id"] in self._queued:
+            return
+        due = at if at is not None else _timestamp(post["publish_at"])
+        heapq.heappush(self._heap, (due, post["_id"], post["platform"]))
+        self._queued.add(post["_id"])
+        # Only an earlier head changes how long the timer should sleep
+        if self._heap[0][1] == post["_id"]:
+            self._wakeup.set()
+
+    async def _resync(self):
+        for post in await self.backlog.pending():
+            self._push(post)
+
+    async def _resync_loop(self):
+        while True:
+            await asyncio.sleep(self.resync_interval)
+            try:
+                await self._resync()
+            except Exception as e:
+                self.logger.error(f"Error reloading the publish backlog: {str(e)}")
+
+    async def _run_loop(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._heap[0][0] - time.time() if self._heap else None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._dispatch_due()
+
+    def _dispatch_due(self):
+        """Pop everything due now, grouped per platform into batches."""
+        horizon = time.time() + self.batch_window
+        due: Dict[str, List[str]] = {}
+        while self._heap and self._heap[0][0] <= horizon:
+            _, post_id, platform = heapq.heappop(self._heap)
+            self._queued.discard(post_id)
+            due.setdefault(platform, []).append(post_id)
+
+        for platform, post_ids in due.items():
+            for index in range(0, len(post_ids), self.max_batch):
+                task = asyncio.create_task(self._publish(platform, post_ids[index:index + self.max_batch]))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+
+    async def _publish(self, platform: str, post_ids: List[str]):
+        limit = self.rate_limits.get(platform)
+        attempt = uuid.uuid4().hex
+        try:
+            if limit:
+                reserved, retry_at = await self.backlog.reserve(
+                    platform,
+                    post_ids,
+                    int(limit["calls"]),
+                    float(limit["period"]),
+                    attempt
+                )
+                if retry_at is not None:
+                    self.stats["rate_limited"] += len(post_ids) - len(reserved)
+                    for post_id in post_ids[len(reserved):]:
+                        self._push({"_id": post_id, "platform": platform}, at=_timestamp(retry_at))
+                post_ids = reserved
+            if not post_ids:
+                return
+
+            posts = await self.backlog.claim(post_ids, self.owner, self.lease_seconds)
+            unsent = set(post_ids) - {post["_id"] for post in posts}
+            if posts:
+                self.stats["batches"] += 1
+                try:
+                    results = await self.publishers[platform].publish_batch(platform, posts)
+                except Exception as e:
+                    results = [{"error": str(e)}] * len(posts)
+
+                for post, result in zip(posts, results):
+                    if result.get("error"):
+                        unsent.add(post["_id"])
+                        await self._retry_or_fail(post, result["error"])
+                    else:
+                        await self.backlog.complete(post["_id"], result)
+                        self._release_video(post)
+                        self.stats["published"] += 1
+            # Posts another scheduler claimed, or that failed, do not use up the limit
+            if limit and unsent:
+                await self.backlog.release(platform, list(unsent), attempt)
+        except Exception as e:
+            self.logger.error(f"Error publishing {len(post_ids)} posts to {platform}: {str(e)}")
+
+    async def _retry_or_fail(self, post: Dict[str, Any], error: str):
+        if post["attempts"] >= post["max_attempts"]:
+            self.logger.error(f"Post {post['_id']} to {post['platform']} failed after {post['attempts']} attempts: {error}")
+            await self.backlog.fail(post["_id"], error)
+            self._release_video(post)
+            self.stats["failed"] += 1
+            return
+
+        delay = min(self.max_backoff, self.retry_backoff * 2 ** (post["attempts"] - 1))
+        delay *= random.uniform(0.5, 1.0)
+        retry_at = datetime.utcnow() + timedelta(seconds=delay)
+        self.logger.warning(f"Post {post['_id']} to {post['platform']} failed, retrying in {delay:.0f}s: {error}")
+        await self.backlog.fail(post["_id"], error, retry_at=retry_at)
+        self.stats["retried"] += 1
+        self._push({**post, "publish_at": retry_at})
+
+    def _release_video(self, post: Dict[str, Any]):
+        if self.media_store is not None:
+            self.media_store.release(post["video_path"], post["_id"])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "queued": len(self._heap),
+            "publishing": len(self._batches)
+        }
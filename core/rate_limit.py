@@ -0,0 +1,147 @@
+# core/rate_limit.py
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional
+    aioredis = None
+
+class TokenBucket:
+    """Async token bucket refilled continuously at rate tokens per second.
+
+    Callers queue in arrival order; a request larger than the bucket is
+    clamped to its capacity so it can still proceed.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1):
+        """Wait until amount tokens are available and take them."""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Return unused tokens (positive) or charge extra ones (negative)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+# Allowed, retry_after seconds, remaining calls
+RateLimitDecision = Tuple[bool, int, int]
+
+def _sliding_window(calls: int, period: float, now: float, current: int, previous: int) -> RateLimitDecision:
+    """Decide on one call from the counts of the current and previous windows.
+
+    The previous window is weighted by how much of it still overlaps the
+    trailing period, which approximates a true sliding window in O(1) space.
+    """
+    elapsed = now % period
+    weight = 1 - elapsed / period
+    estimate = previous * weight + current
+    if estimate < calls:
+        return True, 0, max(0, int(calls - estimate - 1))
+
+    if current >= calls or previous == 0:
+        retry_after = period - elapsed
+    else:
+        # When the decaying previous window lets the estimate drop below calls
+        retry_after = period * (1 - (calls - current) / previous) - elapsed
+    return False, max(1, math.ceil(retry_after)), 0
+
+class SlidingWindowRateLimiter:
+    """Per-key limit of calls per period, kept in process memory.
+
+    Keys are client identities such as an API key, a Telegram chat or a
+    WhatsApp sender. Only the least recently seen max_keys keys are tracked.
+    """
+
+    def __init__(self, calls: int, period: float, max_keys: int = 100000):
+        self.calls = calls
+        self.period = period
+        self.max_keys = max_keys
+        self._windows: OrderedDict = OrderedDict()
+
+    async def hit(self, key: str) -> RateLimitDecision:
+        """Count a call for key unless it is over the limit."""
+        now = time.time()
+        window = int(now // self.period)
+        start, current, previous = self._windows.get(key, (window, 0, 0))
+        if start != window:
+            previous = current if start == window - 1 else 0
+            current = 0
+
+        decision = _sliding_window(self.calls, self.period, now, current, previous)
+        if decision[0]:
+            current += 1
+        self._windows[key] = (window, current, previous)
+        self._windows.move_to_end(key)
+        if len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+        return decision
+
+    async def close(self):
+        pass
+
+# Reads both windows and counts the call only when it is allowed, atomically
+_REDIS_HIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[1]) + current < tonumber(ARGV[2]) then
+    current = redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return {1, current - 1, previous}
+end
+return {0, current, previous}
+"""
+
+class RedisRateLimiter:
+    """SlidingWindowRateLimiter shared by every worker through Redis."""
+
+    def __init__(self, url: str, calls: int, period: float, namespace: str = "fursat:ratelimit"):
+        if aioredis is None:
+            raise RuntimeError("redis package is required for the Redis rate limiter")
+        self.client = aioredis.from_url(url)
+        self.calls = calls
+        self.period = period
+        self.namespace = namespace
+        self.logger = logging.getLogger("RedisRateLimiter")
+        self._script = self.client.register_script(_REDIS_HIT_SCRIPT)
+
+    async def hit(self, key: str) -> RateLimitDecision:
+        """Count a call for key unless it is over the limit; fails open if Redis is down."""
+        now = time.time()
+        window = int(now // self.period)
+        weight = 1 - (now % self.period) / self.period
+        try:
+            _, current, previous = await self._script(
+                keys=[f"{self.namespace}:{key}:{window}", f"{self.namespace}:{key}:{window - 1}"],
+                args=[weight, self.calls, math.ceil(self.period * 2)]
+            )
+        except Exception as e:
+            self.logger.warning(f"Rate limit check failed, allowing call: {str(e)}")
+            return True, 0, self.calls
+        return _sliding_window(self.calls, self.period, now, int(current), int(previous))
+
+    async def close(self):
+        await self.client.close()
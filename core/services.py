@@ -0,0 +1,261 @@
+# core/services.py
+
+import logging
+from typing import Any, Dict, Optional
+
+from config.config_manager import Settings
+from core.metrics import stats_collector
+
+class Services:
+    """Builds and owns the application's clients, agents and workers.
+
+    Nothing is constructed at import time. build() wires everything from
+    settings, importing the heavy client libraries (OpenAI, Motor, Telegram)
+    only then; start() opens connections and stop() releases them.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.logger = logging.getLogger("Services")
+        self.built = False
+        self.started = False
+
+    def build(self) -> "Services":
+        """Construct every client and agent; no network I/O happens here."""
+        if self.built:
+            return self
+
+        from telegram import Bot
+
+        from agents.content_creator import ContentCreatorAgent
+        from agents.trip_planner import TripPlannerAgent
+        from core.agent_base import AgentRouter
+        from core.cache import MongoCache, ReadThroughCache, RedisCache, TTLCache
+        from core.database import Database, TourRepository
+        from core.jobs import InMemoryJobQueue, JobWorker, MongoJobQueue
+        from core.llm import LLMGateway
+        from core.llm_cache import LLMResponseCache
+        from core.publishing import InMemoryPostBacklog, LocalPublisher, MongoPostBacklog, PublishScheduler
+        from core.rate_limit import RedisRateLimiter, SlidingWindowRateLimiter
+        from core.webhooks import WebhookDispatcher
+        from media.executor import RenderExecutor
+        from media.render import RENDITIONS
+        from media.sources import LocalFileSource, YouTubeSource
+        from media.store import MediaStore
+
+        settings = self.settings
+        self.bot = Bot(settings.TELEGRAM_BOT_TOKEN)
+
+        # Initialize data layer (client is opened in start)
+        self.database = Database(
+            settings.MONGODB_CONNECTION_STRING,
+            database_name=settings.MONGODB_DATABASE,
+            max_pool_size=settings.MONGODB_MAX_POOL_SIZE,
+            min_pool_size=settings.MONGODB_MIN_POOL_SIZE,
+            timeout_ms=settings.MONGODB_TIMEOUT_MS
+        )
+        self.redis_cache = RedisCache(settings.REDIS_URL, ttl=settings.CACHE_TTL) if settings.REDIS_URL else None
+        self.tour_cache = ReadThroughCache(
+            "tours",
+            TTLCache(max_size=settings.TOUR_CACHE_SIZE, ttl=settings.TOUR_CACHE_LOCAL_TTL),
+            remote=self.redis_cache
+        )
+        self.tour_repository = TourRepository(
+            self.database,
+            tours_collection=settings.TOURS_COLLECTION,
+            customized_tours_collection=settings.CUSTOMIZED_TOURS_COLLECTION,
+            cache=self.tour_cache
+        )
+
+        # Persistent tier for cached LLM completions
+        if settings.LLM_CACHE_BACKEND == "redis" and settings.REDIS_URL:
+            self.llm_cache_backend = RedisCache(settings.REDIS_URL, ttl=settings.LLM_CACHE_TTL, namespace="fursat:llm")
+        elif settings.LLM_CACHE_BACKEND == "mongo":
+            self.llm_cache_backend = MongoCache(self.database, settings.LLM_CACHE_COLLECTION, ttl=settings.LLM_CACHE_TTL)
+        else:
+            self.llm_cache_backend = None
+        self.llm_cache = LLMResponseCache(
+            ReadThroughCache(
+                "llm",
+                TTLCache(max_size=settings.LLM_CACHE_SIZE, ttl=settings.LLM_CACHE_TTL),
+                remote=self.llm_cache_backend
+            )
+        )
+
+        # One pooled, rate-limited OpenAI client shared by all agents
+        self.llm = LLMGateway(
+            settings.OPENAI_API_KEY,
+            default_model=settings.OPENAI_MODEL,
+            requests_per_minute=settings.OPENAI_RPM,
+            tokens_per_minute=settings.OPENAI_TPM,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            timeout=settings.OPENAI_TIMEOUT,
+            cache=self.llm_cache,
+            base_url=settings.OPENAI_BASE_URL
+        )
+
+        # Video renders run in worker processes
+        self.render_executor = RenderExecutor(
+            max_workers=settings.RENDER_WORKERS,
+            timeout=settings.RENDER_TIMEOUT
+        )
+
+        # Downloaded sources and generated shorts share one disk budget
+        self.media_store = MediaStore(
+            download_dir=settings.DOWNLOAD_DIR,
+            generated_dir=settings.GENERATED_DIR,
+            disk_budget=settings.MEDIA_DISK_BUDGET
+        )
+
+        if settings.VIDEO_SOURCE == "local":
+            self.video_source = LocalFileSource(settings.LOCAL_MEDIA_DIR)
+        else:
+            self.video_source = YouTubeSource()
+
+        # Finished shorts wait in a persisted backlog until they are due
+        if settings.JOB_BACKEND == "memory":
+            self.post_backlog = InMemoryPostBacklog()
+        else:
+            self.post_backlog = MongoPostBacklog(self.database, settings.POSTS_COLLECTION)
+        publisher = LocalPublisher(settings.PUBLISHED_DIR)
+        self.publish_scheduler = PublishScheduler(
+            self.post_backlog,
+            {platform: publisher for platform in RENDITIONS},
+            rate_limits=settings.PUBLISH_RATE_LIMITS,
+            batch_window=settings.PUBLISH_BATCH_WINDOW,
+            max_batch=settings.PUBLISH_MAX_BATCH,
+            max_attempts=settings.PUBLISH_MAX_ATTEMPTS,
+            retry_backoff=settings.PUBLISH_RETRY_BACKOFF,
+            resync_interval=settings.PUBLISH_RESYNC_INTERVAL,
+            media_store=self.media_store
+        )
+
+        # Initialize agents
+        self.content_creator = ContentCreatorAgent(
+            self.llm,
+            render_executor=self.render_executor,
+            media_store=self.media_store,
+            video_source=self.video_source,
+            ingest_mode=settings.INGEST_MODE,
+            render_backend=settings.RENDER_BACKEND,
+            caption_fontfile=settings.CAPTION_FONTFILE,
+            max_duration=settings.MAX_VIDEO_DURATION,
+            default_renditions=settings.RENDITION_PLATFORMS,
+            highlights=settings.HIGHLIGHT_SELECTION,
+            highlight_audio=settings.HIGHLIGHT_AUDIO,
+            highlight_scan_seconds=settings.HIGHLIGHT_SCAN_SECONDS,
+            highlight_seek_samples=settings.HIGHLIGHT_SEEK_SAMPLES,
+            scheduler=self.publish_scheduler
+        )
+        self.trip_planner = TripPlannerAgent(
+            self.tour_repository,
+            self.llm,
+            prompt_token_budget=settings.TRIP_PROMPT_TOKEN_BUDGET,
+            max_output_tokens=settings.TRIP_MAX_OUTPUT_TOKENS,
+            batch_concurrency=settings.TRIP_BATCH_CONCURRENCY
+        )
+
+        # Initialize router
+        self.router = AgentRouter()
+        self.router.register_agent("content_creator", self.content_creator, self._build_limiter("content_creator"))
+        self.router.register_agent("trip_planner", self.trip_planner, self._build_limiter("trip_planner"), coalesce=True)
+        # Batches get their own slots so they cannot starve single customizations
+        self.router.register_agent("trip_planner_batch", self.trip_planner, self._build_limiter("trip_planner_batch"))
+
+        # Durable queue for content jobs; workers may also run separately (worker.py)
+        if settings.JOB_BACKEND == "memory":
+            self.job_queue = InMemoryJobQueue()
+        else:
+            self.job_queue = MongoJobQueue(self.database, settings.JOBS_COLLECTION)
+        self.job_worker = JobWorker(
+            self.job_queue,
+            self.router.route_message,
+            concurrency=settings.JOB_WORKER_CONCURRENCY,
+            lease_seconds=settings.JOB_LEASE_SECONDS,
+            retry_backoff=settings.JOB_RETRY_BACKOFF
+        )
+
+        # Per-client request limits; Redis shares the count across workers
+        if settings.RATE_LIMIT_BACKEND == "redis" and settings.REDIS_URL:
+            self.rate_limiter = RedisRateLimiter(
+                settings.REDIS_URL,
+                calls=settings.RATE_LIMIT_CALLS,
+                period=settings.RATE_LIMIT_PERIOD
+            )
+        else:
+            self.rate_limiter = SlidingWindowRateLimiter(
+                calls=settings.RATE_LIMIT_CALLS,
+                period=settings.RATE_LIMIT_PERIOD
+            )
+
+        # Webhook deliveries are acknowledged at once and processed in the background
+        self.telegram_webhooks = WebhookDispatcher(
+            "telegram",
+            max_recent=settings.WEBHOOK_DEDUP_SIZE,
+            max_pending=settings.WEBHOOK_MAX_PENDING
+        )
+        self.whatsapp_webhooks = WebhookDispatcher(
+            "whatsapp",
+            max_recent=settings.WEBHOOK_DEDUP_SIZE,
+            max_pending=settings.WEBHOOK_MAX_PENDING,
+            max_concurrency=settings.WHATSAPP_CONCURRENCY
+        )
+
+        stats_collector.bind(self)
+        self.built = True
+        return self
+
+    def _build_limiter(self, message_type: str):
+        from core.agent_limits import AgentLimiter
+
+        limits = self.settings.AGENT_LIMITS.get(message_type, {})
+        return AgentLimiter(
+            max_in_flight=int(limits.get("max_in_flight", 4)),
+            max_queue=int(limits.get("max_queue", 16)),
+            timeout=limits.get("timeout", 60)
+        )
+
+    async def start(self, run_workers: Optional[bool] = None):
+        """Open connections, ensure indexes and start the job workers and publisher."""
+        from core.cache import MongoCache
+
+        self.build()
+        await self.database.connect()
+        await self.tour_repository.ensure_indexes()
+        if isinstance(self.llm_cache_backend, MongoCache):
+            await self.llm_cache_backend.ensure_indexes()
+        await self.job_queue.ensure_indexes()
+        await self.post_backlog.ensure_indexes()
+        if self.settings.RUN_JOB_WORKERS if run_workers is None else run_workers:
+            await self.job_worker.start()
+            await self.publish_scheduler.start()
+        self.started = True
+
+    async def stop(self):
+        """Finish background work and release connections."""
+        from core.cache import RedisCache
+
+        if not self.built:
+            return
+        self.started = False
+        await self.telegram_webhooks.drain()
+        await self.whatsapp_webhooks.drain()
+        await self.job_worker.stop()
+        await self.publish_scheduler.stop()
+        await self.render_executor.shutdown()
+        await self.llm.close()
+        await self.rate_limiter.close()
+        await self.database.close()
+        if self.redis_cache:
+            await self.redis_cache.close()
+        if isinstance(self.llm_cache_backend, RedisCache):
+            await self.llm_cache_backend.close()
+
+    async def check_ready(self) -> Dict[str, Any]:
+        """Report whether the services can take traffic."""
+        checks = {
+            "started": self.started,
+            "database": self.started and await self.database.ping()
+        }
+        return {"ready": all(checks.values()), "checks": checks}
@@ -0,0 +1,127 @@
+# core/webhooks.py
+
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Dict, Hashable, Optional, Set
+
+class RecentIds:
+    """Bounded set of recently seen ids; the oldest are forgotten first."""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._ids: OrderedDict = OrderedDict()
+
+    def add(self, item_id: Hashable) -> bool:
+        """Remember item_id, returning False if it was already seen."""
+        if item_id in self._ids:
+            self._ids.move_to_end(item_id)
+            return False
+        self._ids[item_id] = None
+        if len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+        return True
+
+    def discard(self, item_id: Hashable):
+        self._ids.pop(item_id, None)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+class WebhookBacklogFull(Exception):
+    """Too many deliveries are still being processed to accept another."""
+
+class WebhookDispatcher:
+    """Acknowledges webhook deliveries at once and processes them in the background.
+
+    Redelivered ids are dropped. When max_pending deliveries are already in
+    progress new ones are refused, so the sender retries them later instead
+    of the process piling up work. At most max_concurrency of the accepted
+    deliveries run at once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_recent: int = 10000,
+        max_pending: int = 256,
+        max_concurrency: Optional[int] = None
+    ):
+        self.name = name
+        self.max_pending = max_pending
+        self.recent = RecentIds(max_recent)
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        # Delivery receipts and other notifications that need no processing
+        self.statuses: Counter = Counter()
+        self.logger = logging.getLogger(f"Webhook.{name}")
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {
+            "accepted": 0,
+            "duplicates": 0,
+            "rejected": 0,
+            "completed": 0,
+            "errors": 0
+        }
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def submit(self, delivery_id: Hashable, coro: Awaitable[Any]) -> bool:
+        """Schedule coro for delivery_id, returning False for a redelivery.
+
+        Raises WebhookBacklogFull when the backlog is at capacity; the id is
+        not remembered, so the redelivery is processed.
+        """
+        if delivery_id is not None and delivery_id in self.recent:
+            self.stats["duplicates"] += 1
+            coro.close()
+            return False
+        if self.pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            coro.close()
+            raise WebhookBacklogFull(f"{self.name} webhook backlog is full")
+
+        if delivery_id is not None:
+            self.recent.add(delivery_id)
+        task = asyncio.create_task(self._run(delivery_id, coro))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.stats["accepted"] += 1
+        return True
+
+    def record_status(self, status: str):
+        """Count a status notification without scheduling any work."""
+        self.statuses[status or "unknown"] += 1
+
+    async def _run(self, delivery_id: Hashable, coro: Awaitable[Any]):
+        try:
+            if self._semaphore is None:
+                await coro
+            else:
+                async with self._semaphore:
+                    await coro
+            self.stats["completed"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.logger.error(f"Error processing delivery {delivery_id}: {str(e)}")
+
+    async def drain(self, timeout: float = 30):
+        """Wait for in-progress deliveries, cancelling any still running at timeout."""
+        if not self._tasks:
+            return
+        _, still_running = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        await asyncio.gather(*still_running, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "pending": self.pending,
+            "recent_ids": len(self.recent),
+            "statuses": dict(self.statuses)
+        }
@@ -1,86 +1,176 @@
 # handlers/communication.py
 
-from fastapi import FastAPI, HTTPException
-from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+import asyncio
 import json
-import os
+import logging
 
 from core.agent_base import AgentRouter
 
-async def handle_whatsapp_message(message_data: dict, router: AgentRouter):
-    """Handle incoming WhatsApp messages."""
-    try:
-        # Process message based on type
-        if "tour_id" in message_data:
-            response = await router.route_message({
-                "type": "trip_planner",
-                "tour_id": message_data["tour_id"],
-                "customization_needs": message_data.get("customization", {})
-            })
-        elif "content_url" in message_data:
-            response = await router.route_message({
-                "type": "content_creator",
-                "content_type": "youtube",
-                "content_url": message_data["content_url"]
-            })
+if TYPE_CHECKING:
+    from telegram import Bot, Update
+
+logger = logging.getLogger(__name__)
+
+SLOW_DOWN_REPLY = "You are sending messages too quickly. Please try again in {retry_after} seconds."
+
+def parse_whatsapp_payload(payload: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Split a WhatsApp webhook body into inbound messages and status updates.
+
+    Understands Meta Cloud API batches, Twilio form posts and the flat
+    {"tour_id": ...} / {"content_url": ...} format. Every message carries an
+    "id" (None when the sender gave none) and a "from".
+    """
+    messages, statuses = [], []
+    
+    if "entry" in payload:
+        # Meta Cloud API: entries -> changes -> messages/statuses
+        for entry in payload.get("entry") or []:
+            for change in entry.get("changes") or []:
+                value = change.get("value") or {}
+                for item in value.get("messages") or []:
+                    messages.append({
+                        "id": item.get("id"),
+                        "from": item.get("from"),
+                        "text": (item.get("text") or {}).get("body", "")
+                    })
+                for item in value.get("statuses") or []:
+                    statuses.append({"id": item.get("id"), "status": item.get("status")})
+    
+    elif "MessageSid" in payload or "SmsSid" in payload:
+        # Twilio posts one message, or one status callback, per request
+        sid = payload.get("MessageSid") or payload.get("SmsSid")
+        if "Body" in payload:
+            messages.append({"id": sid, "from": payload.get("From"), "text": payload["Body"]})
         else:
-            raise HTTPException(status_code=400, detail="Invalid message format")
-            
-        return response
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+            statuses.append({"id": sid, "status": payload.get("MessageStatus") or payload.get("SmsStatus")})
+    
+    elif "tour_id" in payload or "content_url" in payload:
+        messages.append({**payload, "id": payload.get("message_id"), "from": payload.get("from")})
+    
+    return messages, statuses
+
+def whatsapp_request(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a parsed WhatsApp message into a router message, or a {"reply": ...} for bad input."""
+    if "tour_id" in message:
+        return {
+            "type": "trip_planner",
+            "tour_id": message["tour_id"],
+            "customization_needs": message.get("customization", {})
+        }
+    if "content_url" in message:
+        return {
+            "type": "content_creator",
+            "content_type": "youtube",
+            "content_url": message["content_url"]
+        }
+    return parse_command(message.get("text") or "")
+
+async def handle_whatsapp_message(
+    message: Dict[str, Any],
+    router: AgentRouter,
+    retry_after: Optional[int] = None
+) -> Dict[str, Any]:
+    """Route one parsed WhatsApp message to its agent.
+
+    With retry_after the sender is over the rate limit, and is told to
+    slow down instead. Runs after the webhook has been acknowledged.
+    WhatsApp has no reply channel here yet, so the response is logged and
+    returned.
+    """
+    request = whatsapp_request(message)
+    if retry_after is not None:
+        response = {"error": SLOW_DOWN_REPLY.format(retry_after=retry_after), "retry_after": retry_after}
+    elif "reply" in request:
+        response = {"error": request["reply"]}
+    else:
+        response = await router.route_message(request)
+    
+    logger.info(
+        f"WhatsApp message {message.get('id')} from {message.get('from')}: "
+        f"{'error' if 'error' in response else 'success'}"
+    )
+    return response
 
-async def handle_telegram_message(update: Update, router: AgentRouter):
-    """Handle incoming Telegram messages."""
+# Telegram refuses longer messages
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+# Chat actions expire after about five seconds
+CHAT_ACTION_INTERVAL = 4
+
+def parse_command(message_text: str) -> Dict[str, Any]:
+    """Turn a chat command into a router message, or a {"reply": ...} for bad input."""
+    parts = message_text.split()
+    command = parts[0] if parts else ""
+    
+    if command.startswith('/customizetrip'):
+        # Extract tour ID and customization needs
+        if len(parts) < 2:
+            return {"reply": "Please provide tour ID"}
+        return {
+            "type": "trip_planner",
+            "tour_id": parts[1],
+            "customization_needs": {"text": " ".join(parts[2:])}
+        }
+    
+    if command.startswith('/createcontent'):
+        # Extract content URL
+        if len(parts) < 2:
+            return {"reply": "Please provide content URL"}
+        return {
+            "type": "content_creator",
+            "content_type": "youtube",
+            "content_url": parts[1]
+        }
+    
+    return {"reply": "Unknown command"}
+
+async def _show_chat_action(bot: "Bot", chat_id: int, action: str):
+    """Keep a chat action visible until cancelled."""
+    while True:
+        try:
+            await bot.send_chat_action(chat_id=chat_id, action=action)
+        except Exception as e:
+            logger.warning(f"Could not send chat action to {chat_id}: {str(e)}")
+        await asyncio.sleep(CHAT_ACTION_INTERVAL)
+
+async def handle_telegram_message(
+    update: "Update",
+    router: AgentRouter,
+    bot: "Bot",
+    retry_after: Optional[int] = None
+):
+    """Handle an incoming Telegram message, replying through the bot.
+
+    With retry_after the chat is over the rate limit, and is told to slow
+    down instead. Runs after the webhook has been acknowledged, so the
+    reply is sent with bot.send_message rather than returned.
+    """
+    from telegram.constants import ChatAction
+    
+    message = update.effective_message
+    if message is None or not message.text:
+        return
+    chat_id = message.chat_id
+    
+    if retry_after is not None:
+        await bot.send_message(chat_id=chat_id, text=SLOW_DOWN_REPLY.format(retry_after=retry_after))
+        return
+    
+    request = parse_command(message.text)
+    if "reply" in request:
+        await bot.send_message(chat_id=chat_id, text=request["reply"])
+        return
+    
+    action = ChatAction.UPLOAD_VIDEO if request["type"] == "content_creator" else ChatAction.TYPING
+    progress = asyncio.create_task(_show_chat_action(bot, chat_id, action))
     try:
-        message_text = update.message.text
-        
-        # Parse message to determine type and content
-        if message_text.startswith('/customizetrip'):
-            # Extract tour ID and customization needs
-            parts = message_text.split()
-            if len(parts) < 2:
-                await update.message.reply_text("Please provide tour ID")
-                return
-                
-            tour_id = parts[1]
-            customization = " ".join(parts[2:]) if len(parts) > 2 else ""
-            
-            response = await router.route_message({
-                "type": "trip_planner",
-                "tour_id": tour_id,
-                "customization_needs": {"text": customization}
-            })
-            
-        elif message_text.startswith('/createcontent'):
-            # Extract content URL
-            parts = message_text.split()
-            if len(parts) < 2:
-                await update.message.reply_text("Please provide content URL")
-                return
-                
-            content_url = parts[1]
-            
-            response = await router.route_message({
-                "type": "content_creator",
-                "content_type": "youtube",
-                "content_url": content_url
-            })
-            
-        else:
-            await update.message.reply_text("Unknown command")
-            return
-            
-        await update.message.reply_text(json.dumps(response, indent=2))
-        
+        response = await router.route_message(request)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Error handling Telegram update {update.update_id}: {str(e)}")
+        response = {"error": "Something went wrong, please try again later"}
+    finally:
+        progress.cancel()
     
-# Initialize Telegram bot
-telegram_bot = ApplicationBuilder().token(os.getenv("TELEGRAM_BOT_TOKEN")).build()
-
-# Set up Telegram handlers
-telegram_bot.add_handler(CommandHandler("start", handle_telegram_message))
-telegram_bot.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_telegram_message))
\ No newline at end of file
+    text = json.dumps(response, indent=2, default=str)
+    await bot.send_message(chat_id=chat_id, text=text[:TELEGRAM_MAX_MESSAGE_LENGTH])
@@ -1,34 +1,72 @@
 # main.py
 
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from telegram import Update, Bot
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
+import hmac
+import json
 import logging 
+import time
 import uvicorn
-import os
 from datetime import datetime
 
-from agents.content_creator import ContentCreatorAgent
-from agents.trip_planner import TripPlannerAgent
-from core.agent_base import AgentRouter
-from handlers.communication import handle_whatsapp_message, handle_telegram_message
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s -    %(message)s',
-    filename='logs/fursat_ai.log'
+from config.config_manager import get_settings
+from core.agent_base import STATUS_BUSY, STATUS_TIMEOUT
+from core.agent_limits import PRIORITY_BACKGROUND
+from core.logging_setup import configure_logging, shutdown_logging
+from core.metrics import HTTP_REQUEST_SECONDS, JOB_QUEUE_PENDING, new_trace_id, trace_id
+from core.services import Services
+from core.webhooks import WebhookBacklogFull
+from handlers.communication import (
+    handle_telegram_message,
+    handle_whatsapp_message,
+    parse_whatsapp_payload
 )
+
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Clients and agents are built on startup, not at import
+services = Services(settings)
+
+def setup_logging():
+    """Configure logging; records are written by a background thread started here."""
+    configure_logging(
+        filename=settings.LOG_FILE,
+        level=settings.LOG_LEVEL,
+        log_format=settings.LOG_FORMAT,
+        max_bytes=settings.LOG_MAX_BYTES,
+        backup_count=settings.LOG_BACKUP_COUNT,
+        queue_size=settings.LOG_QUEUE_SIZE,
+        max_chars=settings.LOG_MAX_FIELD_CHARS,
+        sample_rates=settings.LOG_SAMPLE_RATES,
+        redact_keys=settings.LOG_REDACT_KEYS
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    try:
+        services.build()
+        await services.start()
+        try:
+            yield
+        finally:
+            await services.stop()
+    finally:
+        shutdown_logging()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Fursat.fun AI Multi-Agent System",
     description="API for managing travel content and trip planning",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -40,16 +78,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-bot = Bot(os.getenv("TELEGRAM_BOT_TOKEN"))
+def client_key(request: Request) -> str:
+    """Identify the API client by its address.
+
+    Headers the client chooses freely, such as an unchecked API key, would
+    let it dodge the limit by changing them, so only the connection address
+    counts (or the first X-Forwarded-For hop behind a trusted proxy).
+    """
+    forwarded = request.headers.get("X-Forwarded-For")
+    if settings.RATE_LIMIT_TRUST_PROXY and forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    """Limit each API client to RATE_LIMIT_CALLS per RATE_LIMIT_PERIOD.
 
-# Initialize agents
-content_creator = ContentCreatorAgent()
-trip_planner = TripPlannerAgent()
+    Only POSTs, which start renders and LLM calls, count; polling jobs and
+    reading stats stay free.
+    """
+    if (
+        not services.started
+        or request.method != "POST"
+        or not request.url.path.startswith(settings.API_V1_PREFIX)
+    ):
+        return await call_next(request)
+    
+    allowed, retry_after, remaining = await services.rate_limiter.hit(client_key(request))
+    headers = {
+        "X-RateLimit-Limit": str(settings.RATE_LIMIT_CALLS),
+        "X-RateLimit-Remaining": str(remaining)
+    }
+    if not allowed:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Rate limit exceeded"},
+            headers={**headers, "Retry-After": str(retry_after)}
+        )
+    
+    response = await call_next(request)
+    response.headers.update(headers)
+    return response
 
-# Initialize router
-router = AgentRouter()
-router.register_agent("content_creator", content_creator)
-router.register_agent("trip_planner", trip_planner)
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Give each request a trace id for its log lines and time it by route."""
+    token = trace_id.set(request.headers.get("X-Trace-Id", "")[:64] or new_trace_id())
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = trace_id.get()
+        return response
+    finally:
+        # Label by route template so ids in paths do not explode cardinality
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            request.method,
+            route.path if route else "unmatched",
+            str(status)
+        ).observe(time.perf_counter() - started)
+        trace_id.reset(token)
 
 # Request models
 class ContentRequest(BaseModel):
@@ -60,35 +150,111 @@ class ContentRequest(BaseModel):
 class TripRequest(BaseModel):
     tour_id: str
     customization_needs: Dict[str, Any]
+    idempotency_key: Optional[str] = None
+
+class TripBatchRequest(BaseModel):
+    items: List[TripRequest] = Field(min_length=1, max_length=settings.TRIP_BATCH_MAX_ITEMS)
+
+def require_admin(admin_key: Optional[str] = Header(default=None, alias="X-Admin-Key")):
+    """Allow operational endpoints only to callers presenting ADMIN_API_KEY."""
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not hmac.compare_digest(admin_key or "", settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+def raise_for_agent_status(response: Dict[str, Any]):
+    """Map router capacity failures to HTTP errors clients can back off on."""
+    if response.get("status") == STATUS_BUSY:
+        raise HTTPException(
+            status_code=429,
+            detail=response["error"],
+            headers={"Retry-After": str(response["retry_after"])}
+        )
+    if response.get("status") == STATUS_TIMEOUT:
+        raise HTTPException(status_code=503, detail=response["error"])
 
 # API endpoints
-@app.post("/api/v1/content/create")
-async def create_content(request: ContentRequest, background_tasks: BackgroundTasks):
+@app.post("/api/v1/content/create", status_code=202)
+async def create_content(request: ContentRequest):
     """
     Create and schedule content from various sources
     """
     try:
         message = {
             "type": "content_creator",
+            "content_type": "youtube",
             "content_url": request.content_url,
             "platform": request.platform,
-            "schedule_time": request.schedule_time
+            "schedule_time": request.schedule_time,
+            "priority": PRIORITY_BACKGROUND,
+            "trace_id": trace_id.get()
         }
         
-        # Process content creation in background
-        background_tasks.add_task(router.route_message, message)
+        # Queue content creation for the job workers
+        job_id = await services.job_queue.enqueue(
+            "content_creator",
+            message,
+            max_attempts=settings.JOB_MAX_ATTEMPTS
+        )
         
         return {
             "status": "processing",
             "message": "Content creation initiated",
+            "job_id": job_id,
+            "status_url": f"{settings.API_V1_PREFIX}/content/jobs/{job_id}",
             "timestamp": datetime.utcnow()
         }
     except Exception as e:
         logger.error(f"Error in content creation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/content/jobs/{job_id}")
+async def get_content_job(job_id: str):
+    """
+    Get the status and per-stage progress of a content job
+    """
+    job = await services.job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "job_id": job["_id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "stages": job["stages"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+
+@app.get("/api/v1/content/posts/{post_id}")
+async def get_scheduled_post(post_id: str):
+    """
+    Get the publishing status of a scheduled post
+    """
+    post = await services.post_backlog.get(post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    
+    return {
+        "post_id": post["_id"],
+        "platform": post["platform"],
+        "status": post["status"],
+        "publish_at": post["publish_at"],
+        "attempts": post["attempts"],
+        "result": post["result"],
+        "error": post["error"],
+        "created_at": post["created_at"],
+        "updated_at": post["updated_at"]
+    }
+
 @app.post("/api/v1/trip/customize")
-async def customize_trip(request: TripRequest):
+async def customize_trip(
+    request: TripRequest,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
     """
     Customize a trip package based on user requirements
     """
@@ -96,38 +262,237 @@ async def customize_trip(request: TripRequest):
         message = {
             "type": "trip_planner",
             "tour_id": request.tour_id,
-            "customization_needs": request.customization_needs
+            "customization_needs": request.customization_needs,
+            "idempotency_key": request.idempotency_key or idempotency_key,
+            "priority": PRIORITY_BACKGROUND
         }
         
-        response = await router.route_message(message)
+        response = await services.router.route_message(message)
+        raise_for_agent_status(response)
         return response
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in trip customization: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/trip/customize/batch")
+async def customize_trip_batch(request: TripBatchRequest):
+    """
+    Customize several trip packages in one call
+    
+    Returns one result per item, in order; items fail independently and the
+    overall status is success, partial or failed.
+    """
+    try:
+        response = await services.router.route_message({
+            "type": "trip_planner_batch",
+            "items": [item.model_dump() for item in request.items],
+            "priority": PRIORITY_BACKGROUND
+        })
+        raise_for_agent_status(response)
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in batch trip customization: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode a router event as a server-sent event."""
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+@app.post("/api/v1/trip/customize/stream")
+async def customize_trip_stream(
+    request: TripRequest,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
+):
+    """
+    Customize a trip package, streaming the itinerary as server-sent events
+    
+    Emits a "status" event at once ("running", or "queued" with its
+    position), "token" events while the model writes, then a single "done"
+    event with package_id/package_url once the package is saved (or "error").
+    """
+    message = {
+        "type": "trip_planner",
+        "tour_id": request.tour_id,
+        "customization_needs": request.customization_needs,
+        "idempotency_key": request.idempotency_key or idempotency_key,
+        "priority": PRIORITY_BACKGROUND
+    }
+    events = services.router.stream_message(message)
+    
+    # The first event comes without waiting for a slot; a full queue is a 429
+    first_event = await events.__anext__()
+    if first_event["event"] == "error" and first_event["data"].get("status") == STATUS_BUSY:
+        await events.aclose()
+        raise_for_agent_status(first_event["data"])
+    
+    async def body():
+        yield format_sse(first_event)
+        async for event in events:
+            yield format_sse(event)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/v1/tours/{tour_id}/invalidate", dependencies=[Depends(require_admin)])
+async def invalidate_tour(tour_id: str):
+    """
+    Drop a tour from the package cache after it was edited
+    """
+    await services.tour_repository.invalidate_tour(tour_id)
+    return {"status": "invalidated", "tour_id": tour_id}
+
+@app.get("/api/v1/agents/stats", dependencies=[Depends(require_admin)])
+async def agent_stats():
+    """
+    In-flight and queued calls per agent
+    """
+    return {
+        "agents": {
+            message_type: limiter.get_stats()
+            for message_type, limiter in services.router.limiters.items()
+        },
+        "coalescing": services.router.flights.stats
+    }
+
+@app.get("/api/v1/cache/stats", dependencies=[Depends(require_admin)])
+async def cache_stats():
+    """
+    Cache hit/miss counters
+    """
+    return {
+        "tours": services.tour_cache.get_stats(),
+        "llm": services.llm_cache.get_stats(),
+        "openai": services.llm.get_stats(),
+        "media": services.media_store.get_stats()
+    }
+
 @app.post("/webhook/whatsapp")
-async def whatsapp_webhook(message_data: dict):
+async def whatsapp_webhook(request: Request):
     """
     Handle incoming WhatsApp messages
+    
+    Accepts Meta Cloud API batches, Twilio form posts and flat JSON. Each
+    message is acknowledged at once and routed in the background; messages
+    already seen are dropped and status updates are only counted. Senders
+    over the rate limit are told to slow down instead of being routed;
+    redeliveries do not count against the limit.
     """
     try:
-        return await handle_whatsapp_message(message_data, router)
+        if request.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+            payload = dict(await request.form())
+        else:
+            payload = await request.json()
+        messages, statuses = parse_whatsapp_payload(payload)
     except Exception as e:
-        logger.error(f"Error in WhatsApp webhook: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Invalid WhatsApp payload: {str(e)}")
+        raise HTTPException(status_code=400, detail="Invalid message format")
+    
+    if not messages and not statuses:
+        raise HTTPException(status_code=400, detail="Invalid message format")
+    
+    for status in statuses:
+        services.whatsapp_webhooks.record_status(status["status"])
+    
+    accepted = duplicates = rate_limited = 0
+    for message in messages:
+        retry_after = None
+        if message["from"] and message["id"] not in services.whatsapp_webhooks.recent:
+            allowed, retry_after, _ = await services.rate_limiter.hit(f"whatsapp:{message['from']}")
+            if allowed:
+                retry_after = None
+        try:
+            if not services.whatsapp_webhooks.submit(
+                message["id"],
+                handle_whatsapp_message(message, services.router, retry_after)
+            ):
+                duplicates += 1
+            elif retry_after is not None:
+                rate_limited += 1
+            else:
+                accepted += 1
+        except WebhookBacklogFull as e:
+            # Messages accepted so far are remembered, so the retry skips them
+            raise HTTPException(status_code=503, detail=str(e))
+    
+    return {
+        "status": "accepted",
+        "accepted": accepted,
+        "duplicates": duplicates,
+        "rate_limited": rate_limited,
+        "statuses": len(statuses)
+    }
 
 @app.post("/webhook/telegram")
-async def telegram_webhook(request: Request, response_model=None):
+async def telegram_webhook(
+    request: Request,
+    secret_token: Optional[str] = Header(default=None, alias="X-Telegram-Bot-Api-Secret-Token")
+):
     """
     Handle incoming Telegram messages
+    
+    Acknowledges each update immediately; the reply is sent from the
+    background. Redelivered updates are recognised by update_id and dropped.
+    Chats over the rate limit are told to slow down instead of being routed.
     """
+    if settings.TELEGRAM_WEBHOOK_SECRET and not hmac.compare_digest(
+        secret_token or "", settings.TELEGRAM_WEBHOOK_SECRET
+    ):
+        raise HTTPException(status_code=401, detail="Invalid secret token")
+    
+    from telegram import Update
+    
     try:
         body = await request.json()
-        update = Update.de_json(body, bot=bot)
-        return await handle_telegram_message(update, router)
+        update = Update.de_json(body, bot=services.bot)
     except Exception as e:
-        logger.error(f"Error in Telegram webhook: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Invalid Telegram update: {str(e)}")
+        raise HTTPException(status_code=400, detail="Invalid update")
+    
+    # Redeliveries are dropped before they count against the chat's limit
+    retry_after = None
+    if update.effective_chat and update.update_id not in services.telegram_webhooks.recent:
+        allowed, retry_after, _ = await services.rate_limiter.hit(f"telegram:{update.effective_chat.id}")
+        if allowed:
+            retry_after = None
+    
+    try:
+        accepted = services.telegram_webhooks.submit(
+            update.update_id,
+            handle_telegram_message(update, services.router, services.bot, retry_after)
+        )
+    except WebhookBacklogFull as e:
+        # Telegram redelivers on errors, by which time the backlog has drained
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    if not accepted:
+        return {"status": "duplicate"}
+    if retry_after is not None:
+        return {"status": "rate_limited", "retry_after": retry_after}
+    return {"status": "accepted"}
+
+@app.get("/api/v1/publish/stats", dependencies=[Depends(require_admin)])
+async def publish_stats():
+    """
+    Publish scheduler counters
+    """
+    return services.publish_scheduler.get_stats()
+
+@app.get("/api/v1/webhooks/stats", dependencies=[Depends(require_admin)])
+async def webhook_stats():
+    """
+    Webhook delivery counters
+    """
+    return {
+        "telegram": services.telegram_webhooks.get_stats(),
+        "whatsapp": services.whatsapp_webhooks.get_stats()
+    }
 
 @app.get("/health")
 async def health_check():
@@ -140,6 +505,33 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics
+    """
+    if services.started:
+        try:
+            JOB_QUEUE_PENDING.set(await services.job_queue.count_pending())
+        except Exception as e:
+            logger.warning(f"Could not count pending jobs: {str(e)}")
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness check: 200 once startup finished and MongoDB answers, else 503
+    """
+    readiness = await services.check_ready()
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content={
+            "status": "ready" if readiness["ready"] else "starting",
+            "checks": readiness["checks"],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    )
+
 if __name__ == "__main__":
     # Load environment variables
     load_dotenv()
@@ -0,0 +1,133 @@
+# media/executor.py
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from typing import Any, Awaitable, Callable, Optional, Set
+
+class RenderError(Exception):
+    """A render job failed inside its worker process."""
+
+class RenderTimeoutError(RenderError):
+    """A render job exceeded its deadline and was killed."""
+
+def _run_job(conn, fn: Callable, args: tuple):
+    """Entry point of a render worker process."""
+    try:
+        conn.send(("ok", fn(*args)))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+class RenderExecutor:
+    """Runs CPU-heavy render jobs in separate processes.
+
+    At most max_workers jobs run at once; further jobs wait for a free slot.
+    Each job gets its own process so a job that times out or is cancelled
+    can be killed without disturbing the other renders.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: float = 600):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.logger = logging.getLogger("RenderExecutor")
+        # spawn avoids forking the event loop, Mongo client and their threads
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._processes: Set[Any] = set()
+        self._waiting = 0
+        self._running = 0
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Run fn(*args) in a worker process and return its result.
+
+        fn must be a picklable module-level function. Raises RenderTimeoutError
+        when the job outlives its timeout; cancelling the awaiting task kills
+        the worker.
+        """
+        return await self._run_bounded(lambda: self._run_in_process(fn, args), timeout)
+
+    async def run_external(
+        self,
+        job: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None
+    ) -> Any:
+        """Run a coroutine that drives its own subprocess, such as ffmpeg.
+
+        The job counts against the same worker limit and timeout as run();
+        it must kill its subprocess when cancelled.
+        """
+        return await self._run_bounded(job, timeout)
+
+    async def _run_bounded(self, job: Callable[[], Awaitable[Any]], timeout: Optional[float]) -> Any:
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._running += 1
+        try:
+            return await asyncio.wait_for(job(), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise RenderTimeoutError(f"Render job exceeded {timeout or self.timeout}s")
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+    async def _run_in_process(self, fn: Callable, args: tuple) -> Any:
+        parent_conn, child_conn = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_run_job, args=(child_conn, fn, args), daemon=True)
+        process.start()
+        child_conn.close()
+        self._processes.add(process)
+
+        try:
+            await self._wait_readable(parent_conn)
+            try:
+                status, payload = parent_conn.recv()
+            except EOFError:
+                process.join()
+                raise RenderError(f"Render worker exited with code {process.exitcode}")
+
+            if status == "error":
+                raise RenderError(payload)
+            return payload
+        finally:
+            if process.is_alive():
+                process.terminate()
+            await asyncio.to_thread(process.join)
+            parent_conn.close()
+            self._processes.discard(process)
+
+    async def _wait_readable(self, conn):
+        """Wait without blocking the event loop until the worker replies or exits."""
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+
+        def on_readable():
+            if not ready.done():
+                ready.set_result(None)
+
+        loop.add_reader(conn.fileno(), on_readable)
+        try:
+            await ready
+        finally:
+            loop.remove_reader(conn.fileno())
+
+    async def shutdown(self):
+        """Kill any renders still running."""
+        for process in list(self._processes):
+            if process.is_alive():
+                self.logger.warning(f"Terminating render worker {process.pid}")
+                process.terminate()
@@ -0,0 +1,103 @@
+# media/ffmpeg.py
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+class FFmpegError(Exception):
+    """An ffmpeg or ffprobe invocation failed."""
+
+async def run_ffmpeg(args: List[str], binary: str = "ffmpeg") -> bytes:
+    """Run ffmpeg without blocking the event loop and return its stdout."""
+    stdout, _ = await run_ffmpeg_logged(args, binary=binary, loglevel="error")
+    return stdout
+
+async def run_ffmpeg_logged(
+    args: List[str],
+    binary: str = "ffmpeg",
+    loglevel: str = "info"
+) -> Tuple[bytes, str]:
+    """Run ffmpeg at loglevel and return its stdout and log output.
+
+    For filters such as showinfo that report through the log.
+    """
+    process = await asyncio.create_subprocess_exec(
+        binary, "-hide_banner", "-loglevel", loglevel, *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+
+    if process.returncode != 0:
+        raise FFmpegError(f"{binary} exited with {process.returncode}: {stderr.decode(errors='replace').strip()}")
+    return stdout, stderr.decode(errors="replace")
+
+async def run_ffmpeg_with_progress(
+    args: List[str],
+    duration: float,
+    on_progress: Optional[Callable[[float], Awaitable[None]]] = None
+):
+    """Run ffmpeg, reporting the fraction of duration encoded so far."""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1", *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stderr = asyncio.create_task(process.stderr.read())
+    try:
+        async for line in process.stdout:
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            # out_time_ms is reported in microseconds despite its name
+            if key == "out_time_ms" and value.isdigit() and on_progress and duration:
+                await on_progress(min(1.0, int(value) / 1_000_000 / duration))
+        await process.wait()
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        stderr.cancel()
+        raise
+
+    errors = await stderr
+    if process.returncode != 0:
+        raise FFmpegError(f"ffmpeg exited with {process.returncode}: {errors.decode(errors='replace').strip()}")
+
+def escape_filter_value(value: str) -> str:
+    """Quote a value for use as a filter option inside a filter graph."""
+    return "'" + value.replace("'", "'\\''") + "'"
+
+async def probe_duration(url: str) -> Optional[float]:
+    """Container duration in seconds, or None if ffprobe cannot tell."""
+    output = await run_ffmpeg(
+        ["-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", url],
+        binary="ffprobe"
+    )
+    try:
+        return float(output.decode().strip())
+    except ValueError:
+        return None
+
+async def fetch_segment(url: str, output_path: str, start: float, duration: float):
+    """Copy only [start, start + duration) of url into output_path.
+
+    Seeking before -i makes ffmpeg jump through the container index, so for
+    HTTP sources only the byte ranges covering the window are requested,
+    and stream copy avoids decoding them.
+    """
+    await run_ffmpeg([
+        "-y",
+        "-ss", str(start),
+        "-i", url,
+        "-t", str(duration),
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        "-movflags", "+faststart",
+        "-f", "mp4",
+        output_path
+    ])
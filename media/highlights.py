@@ -0,0 +1,255 @@
+# media/highlights.py
+
+import asyncio
+import json
+import math
+import os
+import re
+import tempfile
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from media.ffmpeg import FFmpegError, run_ffmpeg, run_ffmpeg_logged
+
+# Keyframes are scored as tiny grayscale thumbnails
+SAMPLE_WIDTH = 64
+SAMPLE_HEIGHT = 36
+MAX_SAMPLES = 1200
+AUDIO_RATE = 4000  # Hz; plenty for loudness and cheap to decode
+
+# Remote sources are sampled by seeking to this many points, a few at a time
+SEEK_SAMPLES = 48
+SEEK_CONCURRENCY = 4
+
+# Weights of motion, scene change, contrast and audio loudness in the score
+WEIGHTS = {"motion": 1.0, "scene": 1.0, "contrast": 0.5, "audio": 0.75}
+
+_PTS_TIME = re.compile(r"\bn:\s*\d+\s+pts:\s*-?\d+\s+pts_time:(-?[\d.]+)")
+
+async def probe_source(url: str) -> Dict[str, Any]:
+    """Duration in seconds (None if unknown) and whether url has an audio stream."""
+    output = await run_ffmpeg(
+        ["-show_entries", "format=duration:stream=codec_type", "-of", "json", url],
+        binary="ffprobe"
+    )
+    data = json.loads(output or b"{}")
+    duration = data.get("format", {}).get("duration")
+    return {
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+        "has_audio": any(stream.get("codec_type") == "audio" for stream in data.get("streams", []))
+    }
+
+async def sample_keyframes(
+    url: str,
+    duration: float,
+    scan_seconds: Optional[float] = None,
+    audio: bool = True
+) -> Dict[str, Any]:
+    """Keyframes of url as small grayscale frames, with per-second loudness.
+
+    The decoder skips everything but keyframes and at most MAX_SAMPLES of
+    those are kept, so the source is read once but never fully decoded.
+    Audio, when requested, is decoded mono at AUDIO_RATE in the same pass.
+
+    Returns {"times": (N,) seconds, "frames": (N, H, W) uint8,
+    "loudness": (S,) RMS per second or None}.
+    """
+    interval = max(0.5, duration / MAX_SAMPLES)
+    video_filter = ",".join([
+        f"select='isnan(prev_selected_t)+gte(t-prev_selected_t,{interval:.3f})'",
+        f"scale={SAMPLE_WIDTH}:{SAMPLE_HEIGHT}:flags=area",
+        "format=gray",
+        "showinfo"
+    ])
+    args = ["-y", "-nostats", "-skip_frame", "nokey"]
+    if scan_seconds:
+        args += ["-t", str(scan_seconds)]
+    args += [
+        "-i", url,
+        "-map", "0:v:0", "-vf", video_filter, "-vsync", "0",
+        "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1"
+    ]
+
+    audio_path = None
+    if audio:
+        fd, audio_path = tempfile.mkstemp(suffix=".pcm")
+        os.close(fd)
+        args += ["-map", "0:a:0", "-ac", "1", "-ar", str(AUDIO_RATE), "-f", "s16le", audio_path]
+
+    try:
+        stdout, log = await run_ffmpeg_logged(args)
+        loudness = None
+        if audio_path:
+            loudness = await asyncio.to_thread(_loudness, audio_path)
+    finally:
+        if audio_path:
+            os.remove(audio_path)
+
+    frame_size = SAMPLE_WIDTH * SAMPLE_HEIGHT
+    times = np.array([float(value) for value in _PTS_TIME.findall(log)])
+    count = min(len(times), len(stdout) // frame_size)
+    frames = np.frombuffer(stdout, dtype=np.uint8, count=count * frame_size)
+    return {
+        "times": times[:count],
+        "frames": frames.reshape(count, SAMPLE_HEIGHT, SAMPLE_WIDTH),
+        "loudness": loudness
+    }
+
+async def sample_seek_points(url: str, duration: float, samples: int = SEEK_SAMPLES) -> Dict[str, Any]:
+    """One small grayscale frame at each of samples evenly spaced points of url.
+
+    Each point is an input seek followed by a single decoded frame, so over
+    HTTP only the bytes around each point are requested instead of the
+    whole scanned range. The price is coarser scoring: points are far
+    apart, so "motion" compares distant frames and behaves like scene
+    change, and there is no loudness. Points that cannot be read are left
+    out. Returns the same shape as sample_keyframes.
+    """
+    count = max(2, min(samples, int(duration / 0.5)))
+    points = [duration * (index + 0.5) / count for index in range(count)]
+    frame_size = SAMPLE_WIDTH * SAMPLE_HEIGHT
+    semaphore = asyncio.Semaphore(SEEK_CONCURRENCY)
+
+    async def grab(at: float) -> Optional[bytes]:
+        async with semaphore:
+            try:
+                frame = await run_ffmpeg([
+                    "-nostats", "-ss", f"{at:.3f}", "-skip_frame", "nokey", "-i", url,
+                    "-map", "0:v:0", "-frames:v", "1",
+                    "-vf", f"scale={SAMPLE_WIDTH}:{SAMPLE_HEIGHT}:flags=area,format=gray",
+                    "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1"
+                ])
+            except FFmpegError:
+                return None
+            return frame if len(frame) >= frame_size else None
+
+    grabbed = await asyncio.gather(*(grab(at) for at in points))
+    kept = [(at, frame[:frame_size]) for at, frame in zip(points, grabbed) if frame is not None]
+    return {
+        "times": np.array([at for at, _ in kept]),
+        "frames": np.frombuffer(b"".join(frame for _, frame in kept), dtype=np.uint8).reshape(
+            len(kept), SAMPLE_HEIGHT, SAMPLE_WIDTH
+        ),
+        "loudness": None
+    }
+
+def _is_remote(url: str) -> bool:
+    return url.startswith(("http://", "https://"))
+
+def _loudness(path: str) -> np.ndarray:
+    samples = np.fromfile(path, dtype="<i2").astype(np.float32) / 32768
+    seconds = len(samples) // AUDIO_RATE
+    windows = samples[:seconds * AUDIO_RATE].reshape(seconds, AUDIO_RATE)
+    return np.sqrt(np.mean(windows ** 2, axis=1))
+
+def _normalize(values: np.ndarray) -> np.ndarray:
+    """Scale to [0, 1] by the 95th percentile, so one spike does not flatten the rest."""
+    if values.size == 0:
+        return values
+    scale = np.percentile(values, 95)
+    return np.clip(values / scale, 0, 1) if scale > 0 else np.zeros_like(values)
+
+def score_timeline(
+    times: np.ndarray,
+    frames: np.ndarray,
+    duration: float,
+    loudness: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Engagement score for each second of the source.
+
+    Keyframes score on motion (mean pixel change from the previous
+    keyframe), scene change (distance between brightness histograms) and
+    contrast, which keeps black fades and title cards low. Each second
+    takes the score of the keyframe that starts it; loudness is added on
+    top when given.
+    """
+    count = len(frames)
+    pixels = frames.astype(np.float32) / 255
+
+    motion = np.zeros(count, dtype=np.float32)
+    motion[1:] = np.abs(np.diff(pixels, axis=0)).mean(axis=(1, 2))
+
+    # 16-bin histograms of every frame in one bincount, offset per frame
+    bins = (frames >> 4).astype(np.int64) + 16 * np.arange(count)[:, None, None]
+    histograms = np.bincount(bins.ravel(), minlength=16 * count).reshape(count, 16) / frames[0].size
+    scene = np.zeros(count, dtype=np.float32)
+    scene[1:] = 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)
+
+    contrast = pixels.std(axis=(1, 2))
+
+    keyframe_scores = (
+        WEIGHTS["motion"] * _normalize(motion)
+        + WEIGHTS["scene"] * _normalize(scene)
+        + WEIGHTS["contrast"] * _normalize(contrast)
+    )
+
+    seconds = int(math.ceil(duration))
+    centres = np.arange(seconds) + 0.5
+    index = np.clip(np.searchsorted(times, centres, side="right") - 1, 0, count - 1)
+    scores = keyframe_scores[index]
+
+    if loudness is not None and loudness.size:
+        audio = np.zeros(seconds, dtype=np.float32)
+        audio[:min(seconds, loudness.size)] = _normalize(loudness)[:seconds]
+        scores = scores + WEIGHTS["audio"] * audio
+    return scores
+
+def best_window(scores: np.ndarray, window: int) -> int:
+    """Start second of the window with the highest total score."""
+    if len(scores) <= window:
+        return 0
+    totals = np.concatenate(([0.0], np.cumsum(scores)))
+    return int(np.argmax(totals[window:] - totals[:-window]))
+
+async def select_highlight(
+    url: str,
+    clip_seconds: float,
+    duration: Optional[float] = None,
+    scan_seconds: Optional[float] = None,
+    audio: bool = True,
+    seek: Optional[bool] = None,
+    seek_samples: int = SEEK_SAMPLES
+) -> Dict[str, Any]:
+    """Pick the clip_seconds window of url most likely to hold attention.
+
+    Only the first scan_seconds are considered when given. Local files are
+    scanned keyframe by keyframe (sample_keyframes), which reads everything
+    scanned. Remote URLs, or any source when seek is True, are sampled at
+    seek_samples points instead (sample_seek_points): far less is
+    downloaded, but the pick is coarser and ignores audio. The start is
+    moved back to the sample at or before it, so stream-copied segments
+    begin on a clean frame. Returns {"start", "score", "keyframes"}; start
+    is 0 when the source is no longer than the clip.
+    """
+    info = await probe_source(url)
+    duration = duration or info["duration"]
+    if scan_seconds and duration:
+        duration = min(duration, scan_seconds)
+    if not duration or duration <= clip_seconds:
+        return {"start": 0.0, "score": None, "keyframes": 0}
+
+    if seek if seek is not None else _is_remote(url):
+        sample = await sample_seek_points(url, duration, seek_samples)
+    else:
+        sample = await sample_keyframes(
+            url,
+            duration,
+            scan_seconds=scan_seconds,
+            audio=audio and info["has_audio"]
+        )
+    times, frames = sample["times"], sample["frames"]
+    if len(times) < 2:
+        return {"start": 0.0, "score": None, "keyframes": len(times)}
+
+    window = int(clip_seconds)
+    scores = await asyncio.to_thread(score_timeline, times, frames, duration, sample["loudness"])
+    start = best_window(scores, window)
+    score = float(scores[start:start + window].mean())
+
+    earlier = times[times <= start]
+    return {
+        "start": round(float(earlier[-1]) if earlier.size else 0.0, 3),
+        "score": round(score, 4),
+        "keyframes": len(times)
+    }
@@ -0,0 +1,213 @@
+# media/render.py
+
+import os
+import tempfile
+import textwrap
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from media.ffmpeg import escape_filter_value, run_ffmpeg_with_progress
+
+# Output profile per publishing target. Sizes fill the frame (centre crop);
+# caption_margin keeps captions clear of each app's on-screen controls.
+RENDITIONS: Dict[str, Dict[str, Any]] = {
+    "reels": {
+        "width": 1080, "height": 1920, "video_bitrate": "5M", "audio_bitrate": "128k",
+        "fontsize": 52, "caption_margin": 0.22
+    },
+    "shorts": {
+        "width": 1080, "height": 1920, "video_bitrate": "4M", "audio_bitrate": "128k",
+        "fontsize": 52, "caption_margin": 0.15
+    },
+    "tiktok": {
+        "width": 1080, "height": 1920, "video_bitrate": "4M", "audio_bitrate": "128k",
+        "fontsize": 48, "caption_margin": 0.25
+    },
+    "feed": {
+        "width": 1080, "height": 1080, "video_bitrate": "3500k", "audio_bitrate": "128k",
+        "fontsize": 40, "caption_margin": 0.06
+    }
+}
+
+# Platform names clients send, mapped to renditions
+PLATFORM_RENDITIONS = {
+    "instagram": "reels",
+    "reels": "reels",
+    "youtube": "shorts",
+    "shorts": "shorts",
+    "tiktok": "tiktok",
+    "facebook": "feed",
+    "feed": "feed"
+}
+
+def wrap_caption(caption: str, width: int, fontsize: int) -> str:
+    """Break caption into lines that fit width, since drawtext does not wrap."""
+    # Average glyph width is a little over half the font size
+    columns = max(10, int(width * 0.9 / (fontsize * 0.55)))
+    return "\n".join(textwrap.wrap(caption, columns)) or caption
+
+def build_rendition_filter(
+    rendition: Dict[str, Any],
+    caption_file: str,
+    fontfile: Optional[str] = None
+) -> str:
+    """Scale and crop to the rendition's frame, then draw its caption layout."""
+    width, height = rendition["width"], rendition["height"]
+    options = [
+        f"textfile={escape_filter_value(caption_file)}",
+        f"fontsize={rendition['fontsize']}",
+        "fontcolor=white",
+        "box=1",
+        "boxcolor=black@0.6",
+        f"boxborderw={rendition['fontsize'] // 4}",
+        "line_spacing=8",
+        "x=(w-text_w)/2",
+        f"y=h-text_h-{int(height * rendition['caption_margin'])}"
+    ]
+    if fontfile:
+        options.append(f"fontfile={escape_filter_value(fontfile)}")
+    return ",".join([
+        f"scale={width}:{height}:force_original_aspect_ratio=increase",
+        f"crop={width}:{height}",
+        "setsar=1",
+        "drawtext=" + ":".join(options)
+    ])
+
+def build_renditions_command(
+    video_path: str,
+    outputs: List[Tuple[Dict[str, Any], str, str]],
+    start: float = 0,
+    duration: float = 60,
+    fontfile: Optional[str] = None,
+    preset: str = "medium"
+) -> List[str]:
+    """ffmpeg arguments that decode the source once and encode every rendition.
+
+    outputs holds (rendition, caption_file, output_path) per target. The
+    decoded frames are split inside one filter graph, so decoding and
+    seeking are paid once however many targets there are.
+    """
+    labels = [f"[s{index}]" for index in range(len(outputs))]
+    graph = [f"[0:v]split={len(outputs)}{''.join(labels)}"]
+    for index, (rendition, caption_file, _) in enumerate(outputs):
+        graph.append(f"{labels[index]}{build_rendition_filter(rendition, caption_file, fontfile)}[v{index}]")
+
+    args = [
+        "-y",
+        "-ss", str(start),
+        "-t", str(duration),
+        "-i", video_path,
+        "-filter_complex", ";".join(graph)
+    ]
+    for index, (rendition, _, output_path) in enumerate(outputs):
+        bitrate = rendition["video_bitrate"]
+        args += [
+            "-map", f"[v{index}]", "-map", "0:a:0?",
+            "-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p",
+            "-b:v", bitrate, "-maxrate", bitrate, "-bufsize", bitrate,
+            "-c:a", "aac", "-b:a", rendition["audio_bitrate"],
+            "-movflags", "+faststart",
+            "-f", "mp4",
+            output_path
+        ]
+    return args
+
+async def render_renditions_ffmpeg(
+    video_path: str,
+    caption: str,
+    output_paths: Dict[str, str],
+    start: float = 0,
+    duration: float = 60,
+    fontfile: Optional[str] = None,
+    on_progress: Optional[Callable[[float], Awaitable[None]]] = None
+) -> Dict[str, str]:
+    """Render one captioned short per rendition name in output_paths, in one ffmpeg pass."""
+    caption_files = []
+    outputs = []
+    try:
+        for name, output_path in output_paths.items():
+            rendition = RENDITIONS[name]
+            with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+                f.write(wrap_caption(caption, rendition["width"], rendition["fontsize"]))
+                caption_files.append(f.name)
+            outputs.append((rendition, f.name, output_path))
+
+        await run_ffmpeg_with_progress(
+            build_renditions_command(
+                video_path,
+                outputs,
+                start=start,
+                duration=duration,
+                fontfile=fontfile
+            ),
+            duration,
+            on_progress
+        )
+    finally:
+        for caption_file in caption_files:
+            os.remove(caption_file)
+
+    return dict(output_paths)
+
+def render_renditions_moviepy(
+    video_path: str,
+    caption: str,
+    output_paths: Dict[str, str],
+    start: float = 0,
+    duration: float = 60,
+    fontfile: Optional[str] = None
+) -> Dict[str, str]:
+    """Render the same renditions as render_renditions_ffmpeg with moviepy.
+
+    Frame, caption layout and bitrates follow RENDITIONS, so either backend
+    produces the same outputs. Runs inside a render worker process, so
+    moviepy is imported here rather than at module level.
+    """
+    from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
+
+    source = VideoFileClip(video_path)
+    try:
+        clip = source.subclip(start, min(start + duration, source.duration))
+        for name, output_path in output_paths.items():
+            rendition = RENDITIONS[name]
+            width, height = rendition["width"], rendition["height"]
+
+            # Fill the frame and crop the centre, like the ffmpeg scale and crop
+            scale = max(width / clip.w, height / clip.h)
+            scaled = clip.resize(newsize=(max(width, round(clip.w * scale)), max(height, round(clip.h * scale))))
+            framed = scaled.crop(x_center=scaled.w / 2, y_center=scaled.h / 2, width=width, height=height)
+
+            fontsize = rendition["fontsize"]
+            border = fontsize // 4
+            text = TextClip(
+                wrap_caption(caption, width, fontsize),
+                fontsize=fontsize,
+                color="white",
+                font=fontfile or "Arial-Bold",
+                interline=8
+            )
+            boxed = text.on_color(
+                size=(text.w + 2 * border, text.h + 2 * border),
+                color=(0, 0, 0),
+                col_opacity=0.6
+            )
+            top = height - text.h - int(height * rendition["caption_margin"]) - border
+            boxed = boxed.set_position(("center", top)).set_duration(framed.duration)
+
+            bitrate = rendition["video_bitrate"]
+            final_clip = CompositeVideoClip([framed, boxed], size=(width, height))
+            final_clip.write_videofile(
+                output_path,
+                codec="libx264",
+                audio_codec="aac",
+                bitrate=bitrate,
+                audio_bitrate=rendition["audio_bitrate"],
+                preset="medium",
+                ffmpeg_params=["-pix_fmt", "yuv420p", "-maxrate", bitrate, "-bufsize", bitrate, "-movflags", "+faststart"],
+                logger=None
+            )
+            for item in (final_clip, boxed, text, framed, scaled):
+                item.close()
+    finally:
+        source.close()
+
+    return dict(output_paths)
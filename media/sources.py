@@ -0,0 +1,99 @@
+# media/sources.py
+
+import asyncio
+import hashlib
+import os
+import shutil
+from abc import ABC, abstractmethod
+from typing import Any, Dict
+
+from media.ffmpeg import probe_duration
+
+class InvalidSourceError(ValueError):
+    """The reference does not name a video that can be fetched; retrying will not help."""
+
+class VideoSource(ABC):
+    """Resolves content references to something ffmpeg can read."""
+
+    @abstractmethod
+    def key_for(self, ref: str) -> str:
+        """Stable storage key for ref, computed without network access."""
+        pass
+
+    @abstractmethod
+    async def resolve(self, ref: str) -> Dict[str, Any]:
+        """Return {"key", "title", "duration", "url"} for ref."""
+        pass
+
+    @abstractmethod
+    async def download(self, source: Dict[str, Any], output_path: str):
+        """Fetch the whole source to output_path."""
+        pass
+
+class YouTubeSource(VideoSource):
+    """YouTube videos resolved through pytube to their progressive mp4 stream."""
+
+    def key_for(self, ref: str) -> str:
+        from pytube import extract
+        from pytube.exceptions import RegexMatchError
+        try:
+            return extract.video_id(ref)
+        except RegexMatchError:
+            raise InvalidSourceError(f"Not a YouTube video URL: {ref}")
+
+    async def resolve(self, ref: str) -> Dict[str, Any]:
+        def _resolve() -> Dict[str, Any]:
+            from pytube import YouTube
+            from pytube.exceptions import RegexMatchError, VideoUnavailable
+            try:
+                yt = YouTube(ref)
+                stream = yt.streams.filter(progressive=True, file_extension='mp4').first()
+            except (RegexMatchError, VideoUnavailable) as e:
+                raise InvalidSourceError(f"Video unavailable: {ref} ({str(e)})")
+            if stream is None:
+                raise InvalidSourceError(f"No progressive mp4 stream for {ref}")
+            return {
+                "key": yt.video_id,
+                "title": yt.title,
+                "duration": yt.length,
+                "url": stream.url,
+                "stream": stream
+            }
+
+        return await asyncio.to_thread(_resolve)
+
+    async def download(self, source: Dict[str, Any], output_path: str):
+        await asyncio.to_thread(source["stream"].download, filename=output_path)
+
+class LocalFileSource(VideoSource):
+    """Video files on local disk, used for development and tests."""
+
+    def __init__(self, root: str = "."):
+        self.root = root
+
+    def _path(self, ref: str) -> str:
+        """Real path of ref under root; refs resolving outside root are refused."""
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, ref))
+        if os.path.commonpath([root, path]) != root:
+            raise InvalidSourceError(f"{ref!r} is outside the local media directory")
+        return path
+
+    def key_for(self, ref: str) -> str:
+        path = self._path(ref)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return f"{stem}-{hashlib.sha1(path.encode()).hexdigest()[:12]}"
+
+    async def resolve(self, ref: str) -> Dict[str, Any]:
+        path = self._path(ref)
+        if not os.path.isfile(path):
+            raise InvalidSourceError(f"Video not found: {ref}")
+        return {
+            "key": self.key_for(ref),
+            "title": os.path.splitext(os.path.basename(path))[0],
+            "duration": await probe_duration(path),
+            "url": path
+        }
+
+    async def download(self, source: Dict[str, Any], output_path: str):
+        await asyncio.to_thread(shutil.copyfile, source["url"], output_path)
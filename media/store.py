@@ -0,0 +1,218 @@
+# media/store.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core.singleflight import SingleFlight
+
+class MediaStore:
+    """Local store for downloaded sources and generated outputs.
+
+    Downloads are keyed by video id. Each one has a JSON sidecar that records
+    its content hash and metadata. Identical content downloaded under another
+    id is hard-linked rather than stored twice. Concurrent fetches of the same
+    id share one download. Least recently used files are evicted once
+    downloads and generated outputs together exceed the disk budget.
+    Files in use are pinned for as long as the caller holds them; files
+    waiting on later work (such as a scheduled post) are held by a marker
+    file next to them, which other processes sharing the directories see
+    and which survives restarts.
+    """
+
+    def __init__(
+        self,
+        download_dir: str = "downloads",
+        generated_dir: str = "generated",
+        disk_budget: int = 10 * 1024 ** 3
+    ):
+        self.download_dir = download_dir
+        self.generated_dir = generated_dir
+        self.disk_budget = disk_budget
+        self.logger = logging.getLogger("MediaStore")
+        self._flights = SingleFlight()
+        self._hashes: Dict[str, str] = {}
+        self._pins: Dict[str, int] = {}
+        self.stats = {"hits": 0, "downloads": 0, "deduplicated": 0, "evicted_bytes": 0}
+        os.makedirs(download_dir, exist_ok=True)
+        os.makedirs(generated_dir, exist_ok=True)
+        self._load_index()
+
+    def source_path(self, key: str) -> str:
+        return os.path.join(self.download_dir, f"{key}.mp4")
+
+    def output_path(self, name: str, extension: str = "mp4") -> str:
+        """Path for a generated file, with the name made filesystem safe."""
+        safe_name = re.sub(r"[^\w-]+", "_", name).strip("_")[:100] or "output"
+        return os.path.join(self.generated_dir, f"{safe_name}.{extension}")
+
+    async def fetch(
+        self,
+        key: str,
+        download: Callable[[str], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Return {"path", **metadata} for key, downloading it at most once.
+
+        download(target_path) writes the file and returns metadata to keep
+        alongside it.
+        """
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached:
+            self.stats["hits"] += 1
+            return cached
+        return await self._flights.do(key, lambda: self._download(key, download))
+
+    async def _download(
+        self,
+        key: str,
+        download: Callable[[str], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        path = self.source_path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            metadata = await download(temp_path)
+            self.stats["downloads"] += 1
+            entry = await asyncio.to_thread(self._commit, key, temp_path, metadata)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        await self.enforce_budget()
+        return entry
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.source_path(key)
+        sidecar = self._sidecar_path(path)
+        if not (os.path.exists(path) and os.path.exists(sidecar)):
+            return None
+        self.touch(path)
+        with open(sidecar) as f:
+            return {"path": path, **json.load(f)}
+
+    def _commit(self, key: str, temp_path: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Move a finished download into place, linking to identical content if present."""
+        path = self.source_path(key)
+        digest = self._hash_file(temp_path)
+        existing = self._hashes.get(digest)
+
+        if existing and existing != path and os.path.exists(existing):
+            os.link(existing, f"{temp_path}.link")
+            os.replace(f"{temp_path}.link", path)
+            self.stats["deduplicated"] += 1
+        else:
+            os.replace(temp_path, path)
+        self._hashes[digest] = path
+
+        entry = {**metadata, "sha256": digest, "size": os.path.getsize(path)}
+        with open(self._sidecar_path(path), "w") as f:
+            json.dump(entry, f, default=str)
+        return {"path": path, **entry}
+
+    def _load_index(self):
+        for name in os.listdir(self.download_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.download_dir, name)) as f:
+                    digest = json.load(f).get("sha256")
+            except (OSError, ValueError):
+                continue
+            if digest:
+                self._hashes[digest] = os.path.join(self.download_dir, name[:-len(".json")])
+
+    def _sidecar_path(self, path: str) -> str:
+        return f"{path}.json"
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def touch(self, path: str):
+        """Mark a file as recently used."""
+        os.utime(path)
+
+    @contextmanager
+    def pinned(self, *paths: str):
+        """Protect files from eviction while they are in use."""
+        for path in paths:
+            self._pins[path] = self._pins.get(path, 0) + 1
+        try:
+            yield
+        finally:
+            for path in paths:
+                self._pins[path] -= 1
+                if not self._pins[path]:
+                    del self._pins[path]
+
+    def _hold_path(self, path: str, owner: str) -> str:
+        return f"{path}.{owner}.hold"
+
+    def hold(self, path: str, owner: str):
+        """Keep path from eviction until owner releases it."""
+        with open(self._hold_path(path, owner), "a"):
+            pass
+
+    def release(self, path: str, owner: str):
+        """Drop owner's hold on path; it is evictable once no holds remain."""
+        try:
+            os.remove(self._hold_path(path, owner))
+        except FileNotFoundError:
+            pass
+
+    async def register_output(self, path: str):
+        """Account for a newly generated file against the disk budget."""
+        self.touch(path)
+        await self.enforce_budget()
+
+    async def enforce_budget(self):
+        await asyncio.to_thread(self._evict_to_budget)
+
+    def _evict_to_budget(self):
+        files: List[tuple] = []
+        inodes = set()
+        held = set()
+        total = 0
+        for directory in (self.download_dir, self.generated_dir):
+            for entry in os.scandir(directory):
+                if entry.name.endswith(".hold"):
+                    held.add(entry.path.rsplit(".", 2)[0])
+                    continue
+                if not entry.is_file() or entry.name.endswith((".json", ".part")):
+                    continue
+                stat = entry.stat()
+                # Hard-linked duplicates only occupy disk once
+                size = 0 if (stat.st_dev, stat.st_ino) in inodes else stat.st_size
+                inodes.add((stat.st_dev, stat.st_ino))
+                total += size
+                files.append((stat.st_mtime, size, entry.path))
+
+        if total <= self.disk_budget:
+            return
+
+        for _, size, path in sorted(files):
+            if total <= self.disk_budget:
+                break
+            if path in self._pins or path in held:
+                continue
+            self.logger.info(f"Evicting {path} ({size} bytes)")
+            for doomed in (path, self._sidecar_path(path)):
+                if os.path.exists(doomed):
+                    os.remove(doomed)
+            total -= size
+            self.stats["evicted_bytes"] += size
+        self._hashes = {
+            digest: path for digest, path in self._hashes.items() if os.path.exists(path)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, **self._flights.stats}
@@ -0,0 +1,31 @@
+# worker.py
+
+import asyncio
+import signal
+
+from dotenv import load_dotenv
+
+async def run_worker():
+    """Run content job workers outside the API process."""
+    from core.logging_setup import shutdown_logging
+    from main import logger, services, setup_logging
+
+    setup_logging()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await services.start(run_workers=True)
+    logger.info("Content job worker running")
+
+    await stop.wait()
+
+    await services.stop()
+    shutdown_logging()
+
+if __name__ == "__main__":
+    # Load environment variables
+    load_dotenv()
+    asyncio.run(run_worker())